@@ -0,0 +1,154 @@
+"""
+Micro-benchmark of the streaming tool call parsers (custom `[CALL]` and native openai).
+
+Parses synthetic streams of several sizes (and optionally the streams of a replay
+file recorded with `record_to`) and reports the parser overhead per token.
+
+    python benchmarks/bench_parsers.py --out parsers.json
+    python benchmarks/bench_parsers.py --replay recording.jsonl --baseline parsers.json
+"""
+from typing import Any
+import argparse
+import json
+import random
+import sys
+import time
+
+from quack_norris.core.llm.types import Tool
+from quack_norris.core.llm.replay import chunk_from_dict
+from quack_norris.core.llm.response_custom import CustomToolCallingResponseStream
+from quack_norris.core.llm.response_openai import OpenAIToolCallingResponseStream
+
+
+PARSERS = {
+    "custom": CustomToolCallingResponseStream,
+    "openai": OpenAIToolCallingResponseStream,
+}
+TOOLS = [
+    Tool(name="search", description="Search the web.", parameters={}, tool_callable=lambda **kwargs: ""),
+]
+WORDS = [
+    " the", " duck", " quack", "s", ",", ".", " is", " a", " [", "link", "](", "url", ")",
+    " `", "code", "`", " <", "b", ">", "\n", "\n\n", " -", " 42", "ing", " norris",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the streaming tool call parsers.")
+    parser.add_argument("--sizes", type=str, default="100,1000,10000", help="Tokens per synthetic stream.")
+    parser.add_argument("--group", type=str, default="1,16", help="Tokens per chunk (some backends batch tokens).")
+    parser.add_argument("--replay", type=str, default="", help="Also parse the streams of this replay file.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions, the fastest one is reported.")
+    parser.add_argument("--out", type=str, default="", help="Write the results as json to this file.")
+    parser.add_argument("--baseline", type=str, default="", help="Compare against the results in this file.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    streams: dict[str, tuple[str, list[dict[str, Any]]]] = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for group in [int(g) for g in args.group.split(",")]:
+            for parser in PARSERS:
+                chunks = synthetic_stream(size, custom_tool_calling=parser == "custom")
+                streams[f"{parser}/{size}x{group}"] = (parser, group_chunks(chunks, group))
+    if args.replay != "":
+        with open(args.replay, "r", encoding="utf-8") as f:
+            for idx, line in enumerate(f):
+                if line.strip() == "":
+                    continue
+                recording = json.loads(line)
+                parser = "custom" if recording.get("custom_tool_calling", False) else "openai"
+                streams[f"{parser}/replay-{idx}"] = (parser, recording["chunks"])
+
+    results: dict[str, Any] = {}
+    for name, (parser, chunks) in streams.items():
+        result = run_benchmark(parser, chunks, args.repeat)
+        results[name] = result
+        print(
+            f"{name:24} {result['tokens']:8d} tokens {result['chunks']:8d} chunks {result['duration'] * 1000:9.2f}ms "
+            f"{result['us_per_token']:7.2f}us/token"
+        )
+
+    if args.out != "":
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"scenarios": results}, indent=2))
+    if args.baseline != "":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.loads(f.read())["scenarios"]
+        regressions = [
+            f"{name}: {baseline[name]['us_per_token']:.2f} -> {result['us_per_token']:.2f}us/token"
+            for name, result in results.items()
+            if name in baseline and result["us_per_token"] > baseline[name]["us_per_token"] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions compared to the baseline.")
+
+
+def run_benchmark(parser: str, chunks: list[dict[str, Any]], repeat: int) -> dict[str, Any]:
+    # Build the chunk objects upfront, so only the parser is measured
+    objects = [chunk_from_dict(chunk) for chunk in chunks]
+    durations = []
+    for _ in range(repeat):
+        response = PARSERS[parser](_Stream(objects), TOOLS)
+        start = time.perf_counter()
+        for _ in response.stream:
+            pass
+        durations.append(time.perf_counter() - start)
+        response.tool_calls  # Make sure the stream was parsed completely
+    duration = min(durations)
+    tokens = sum(chunk.get("group", 1) for chunk in chunks)
+    return {
+        "tokens": tokens,
+        "chunks": len(chunks),
+        "duration": duration,
+        "us_per_token": duration / max(tokens, 1) * 1e6,
+    }
+
+
+def synthetic_stream(size: int, custom_tool_calling: bool) -> list[dict[str, Any]]:
+    """A reproducible stream of `size` tokens: thinking, markdown text and a tool call at the end."""
+    rng = random.Random(size)
+    thinking = size // 10
+    tokens = ["<think>"] + [rng.choice(WORDS) for _ in range(thinking)] + ["</think>"]
+    tokens += [rng.choice(WORDS) for _ in range(max(size - thinking - 12, 0))]
+    arguments = ['{"', "query", '":', ' "', "quack", " norris", '"}']
+    if custom_tool_calling:
+        chunks = [{"content": token} for token in tokens + ["\n\n", "[", "CALL", "]", ' {"name": "search", "parameters": ']]
+        chunks += [{"content": argument} for argument in arguments] + [{"content": "}\n\n"}]
+    else:
+        chunks = [{"content": token} for token in tokens]
+        chunks.append({"content": "", "tool_calls": [{"index": 0, "id": "call_0", "name": "search", "arguments": ""}]})
+        chunks += [
+            {"content": "", "tool_calls": [{"index": 0, "id": None, "name": None, "arguments": argument}]}
+            for argument in arguments
+        ]
+    return chunks
+
+
+def group_chunks(chunks: list[dict[str, Any]], group: int) -> list[dict[str, Any]]:
+    """Merge the content of `group` consecutive chunks, tool call deltas stay separate."""
+    if group <= 1:
+        return chunks
+    out: list[dict[str, Any]] = []
+    for chunk in chunks:
+        if "tool_calls" in chunk or len(out) == 0 or "tool_calls" in out[-1] or out[-1]["group"] >= group:
+            out.append(dict(chunk, group=1))
+        else:
+            out[-1]["content"] += chunk["content"]
+            out[-1]["group"] += 1
+    return out
+
+
+## Internals
+class _Stream(list):
+    def close(self) -> None:
+        pass
+
+
+if __name__ == "__main__":
+    main()
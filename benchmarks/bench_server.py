@@ -0,0 +1,303 @@
+"""
+End-to-end benchmark of the serving path (`create_openai_api`), no GPU required.
+
+LLM calls are answered by the `mock` model connector and tool calls go to the
+stand-in MCP server (`mcp_standin.py`). Every scenario (transport x handler x
+streaming x concurrency) sends `--requests` chat requests and reports throughput,
+p50/p99 latency and time to first token, and the serving overhead per token.
+
+    python benchmarks/bench_server.py --out results.json
+    python benchmarks/bench_server.py --baseline results.json  # exit code 1 on regressions
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from quack_norris.logging import log_only_warn
+from quack_norris.config import Config
+from quack_norris.api.server import ChatCompletionRequest, create_openai_api
+from quack_norris.api.chat_handler import ChatHandlerRegistry
+from quack_norris.core.llm.types import ChatMessage
+from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.llm.proxy_chat_handler import ProxyChatHandlerProvider
+from quack_norris.core.agents.agent_registry import set_default_agent_llm, load_and_watch_agents
+from quack_norris.core.agents.multi_agent_runner import MultiAgentRunner
+from quack_norris.core.tools.mcp import initialize_mcp_tools
+
+
+HANDLERS = {
+    "proxy": "proxy.mock-llm",
+    "agent": "agent.bench-chat",
+    "tools": "agent.bench-tools",
+}
+AGENTS = {
+    "bench-chat.agent.md": "---\ndescription: Benchmark agent without tools.\nmodel: mock-llm\n---\n\nYou are a benchmark.\n",
+    "bench-tools.agent.md": "---\ndescription: Benchmark agent calling tools.\nmodel: mock-tools\ntools: bench.*\n---\n\nYou are a benchmark.\n",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the quack-norris server.")
+    parser.add_argument("--transports", type=str, default="asgi,http", help="In-process (asgi) and/or via uvicorn (http).")
+    parser.add_argument("--handlers", type=str, default="proxy,agent,tools", help=f"Any of {', '.join(HANDLERS)}.")
+    parser.add_argument("--concurrency", type=str, default="1,8,32", help="Concurrency levels to benchmark.")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per scenario.")
+    parser.add_argument("--tokens", type=int, default=128, help="Tokens generated per LLM call.")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Simulated time to first token of the LLM.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Simulated LLM speed (0 is unlimited).")
+    parser.add_argument("--tool-rounds", type=int, default=3, help="Tool calls per request in the `tools` scenarios.")
+    parser.add_argument("--mcp-port", type=int, default=13390, help="Port for the stand-in MCP server.")
+    parser.add_argument("--out", type=str, default="", help="Write the results as json to this file.")
+    parser.add_argument("--baseline", type=str, default="", help="Compare against the results in this file.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    log_only_warn()
+    handlers = args.handlers.split(",")
+    mcp_server = None
+    if "tools" in handlers:
+        mcp_server = _start_mcp_standin(args.mcp_port)
+    try:
+        config = setup(args, with_tools="tools" in handlers)
+        app = create_openai_api(config)
+        logging.disable(logging.INFO)  # Do not log every request
+        results = asyncio.run(run_all(app, args, handlers))
+    finally:
+        if mcp_server is not None:
+            mcp_server.terminate()
+
+    if args.out != "":
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(results, indent=2))
+    if args.baseline != "":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.loads(f.read()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions compared to the baseline.")
+
+
+def setup(args, with_tools: bool) -> Config:
+    """Register mock LLMs, the proxy, the benchmark agents and the stand-in MCP tools."""
+    mock_config = {"tokens": args.tokens, "ttft": args.ttft, "tokens_per_second": args.tokens_per_second}
+    config = Config("bench.json", overwrites={
+        "llms": {
+            "mock-llm": {
+                "api_endpoint": "", "api_key": "", "provider": "mock", "model": "mock-llm",
+                "config": mock_config,
+            },
+            "mock-tools": {
+                "api_endpoint": "", "api_key": "", "provider": "mock", "model": "mock-tools",
+                "config": dict(
+                    mock_config,
+                    tool_call={"name": "bench.echo", "arguments": {"text": "quack"}},
+                    tool_rounds=args.tool_rounds,
+                ),
+            },
+        },
+        "proxy": ["mock-llm"],
+        "discovery_cache": {"enabled": False},
+        "coalesce_requests": False,
+    })
+    ModelProvider.initialize(config)
+    ProxyChatHandlerProvider.setup_from_config(config)
+
+    agent_directory = tempfile.mkdtemp(prefix="quack-norris-bench-")
+    for name, content in AGENTS.items():
+        with open(os.path.join(agent_directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
+    set_default_agent_llm("mock-llm")
+    load_and_watch_agents(agent_directory)
+
+    tools = []
+    if with_tools:
+        mcp_configs = {"bench": {"type": "http", "url": f"http://127.0.0.1:{args.mcp_port}/mcp"}}
+        tools = asyncio.run(initialize_mcp_tools(mcp_configs, builtins=False))
+    ChatHandlerRegistry.register_handler_provider(MultiAgentRunner(default_agent="auto", tools=tools))
+    return config
+
+
+async def run_all(app: FastAPI, args, handlers: list[str]) -> dict[str, Any]:
+    scenarios: dict[str, Any] = {}
+    for transport in args.transports.split(","):
+        async with _client(app, transport) as client:
+            for handler in handlers:
+                for stream in [True, False]:
+                    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                        name = f"{transport}/{handler}/{'stream' if stream else 'blocking'}/c{concurrency}"
+                        result = await run_scenario(
+                            client, HANDLERS[handler], stream, concurrency, args.requests, args.tokens
+                        )
+                        scenarios[name] = result
+                        print(
+                            f"{name:32} {result['throughput']:8.1f} req/s "
+                            f"latency p50 {result['latency_p50'] * 1000:8.1f}ms p99 {result['latency_p99'] * 1000:8.1f}ms "
+                            f"ttft p50 {result['ttft_p50'] * 1000:8.1f}ms p99 {result['ttft_p99'] * 1000:8.1f}ms "
+                            f"{result['us_per_token']:8.1f}us/token"
+                        )
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "scenarios": scenarios,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, model: str, stream: bool, concurrency: int, requests: int, tokens: int
+) -> dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _limited():
+        async with semaphore:
+            return await run_request(client, model, stream)
+
+    await run_request(client, model, stream)  # Warm up
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_limited() for _ in range(requests)])
+    duration = time.perf_counter() - start
+    latencies = [r["latency"] for r in results]
+    ttfts = [r["ttft"] for r in results]
+    return {
+        "requests": requests,
+        "duration": duration,
+        "throughput": requests / duration,
+        "tokens_per_second": requests * tokens / duration,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p99": percentile(ttfts, 99),
+        "us_per_token": percentile(latencies, 50) / max(tokens, 1) * 1e6,
+        "chunks": sum(r["chunks"] for r in results) / len(results),
+    }
+
+
+_request_ids = itertools.count()
+
+
+async def run_request(client: httpx.AsyncClient, model: str, stream: bool) -> dict[str, float]:
+    # Unique prompts, so no request is answered by a cache or coalesced with another one
+    request = ChatCompletionRequest(
+        model=model,
+        messages=[ChatMessage(role="user", content=f"Benchmark request {next(_request_ids)}")],
+        stream=stream,
+    )
+    body = request.model_dump(mode="json")
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    if stream:
+        async with client.stream("POST", "/chat/completions", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                if first is None:
+                    first = time.perf_counter()
+                chunks += 1
+    else:
+        response = await client.post("/chat/completions", json=body)
+        response.raise_for_status()
+        chunks = 1
+    end = time.perf_counter()
+    return {"latency": end - start, "ttft": (first or end) - start, "chunks": chunks}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """List the scenarios which got slower than the baseline by more than the tolerance."""
+    regressions = []
+    for name, result in results["scenarios"].items():
+        base = baseline["scenarios"].get(name, None)
+        if base is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+        for key in ["latency_p50", "latency_p99", "ttft_p50", "ttft_p99"]:
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {base[key] * 1000:.1f} -> {result[key] * 1000:.1f}ms")
+    return regressions
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+## Internals
+@asynccontextmanager
+async def _client(app: FastAPI, transport: str) -> AsyncIterator[httpx.AsyncClient]:
+    if transport == "asgi":
+        # Note: the asgi transport of httpx buffers the body, so the ttft equals the latency
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+        ) as client:
+            yield client
+    elif transport == "http":
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            await asyncio.sleep(0.05)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+                yield client
+        finally:
+            server.should_exit = True
+            thread.join()
+    else:
+        raise ValueError(f"Unknown transport `{transport}`, use `asgi` or `http`.")
+
+
+def _start_mcp_standin(port: int) -> subprocess.Popen:
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_standin.py")
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Stand-in MCP server did not start on port {port}.")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    main()
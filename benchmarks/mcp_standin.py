@@ -0,0 +1,43 @@
+"""
+Stand-in MCP server for the benchmarks, so tool calls do not depend on the filesystem.
+
+    python benchmarks/mcp_standin.py --port 13390
+"""
+import argparse
+import asyncio
+
+from fastmcp import FastMCP
+
+
+def build_mcp_server() -> FastMCP:
+    mcp_server = FastMCP("Benchmark MCP Server")
+
+    @mcp_server.tool
+    def echo(text: str) -> str:
+        """Return the text unchanged."""
+        return text
+
+    @mcp_server.tool
+    def payload(size: int) -> str:
+        """Return a text of `size` characters, to benchmark large tool results."""
+        return ("quack " * (size // 6 + 1))[:size]
+
+    @mcp_server.tool
+    async def wait(seconds: float) -> str:
+        """Wait for some seconds, like a slow tool would."""
+        await asyncio.sleep(seconds)
+        return f"Waited {seconds}s"
+
+    return mcp_server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=13390)
+    args = parser.parse_args()
+    build_mcp_server().run(transport="http", host=args.host, port=args.port, show_banner=False)
+
+
+if __name__ == "__main__":
+    main()
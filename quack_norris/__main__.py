@@ -2,11 +2,16 @@ import argparse
 import os
 
 from quack_norris.api.server import serve_openai_api
-from quack_norris.api.cli import cli_chat
+from quack_norris.api.workers import serve_workers
+from quack_norris.api.cli import cli_chat, cli_batch
 from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.llm.warm_up import preload_models
 from quack_norris.core.llm.proxy_chat_handler import ProxyChatHandlerProvider
 from quack_norris.core.agents.multi_agent_runner import MultiAgentRunner
 from quack_norris.config import Config
+from quack_norris.core.tracing import setup_tracing
+from quack_norris.core.blob_store import setup_blob_store
+from quack_norris.core.profiling import setup_profiling
 from quack_norris.logging import logger, log_only_warn
 from quack_norris.ui.app import create_ui
 
@@ -30,6 +35,31 @@ def parse_args():
         default=os.curdir,
         help="A folder to which the llm has access.",
     )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default="",
+        help="Write a profile per request (cli or server) into this folder and log event loop stalls.",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        type=str,
+        default="sampling",
+        choices=["sampling", "cprofile"],
+        help="Either a sampling profiler (collapsed stacks for flamegraphs) or cProfile (pstats).",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        default=1,
+        help="Only profile every N-th request.",
+    )
+    parser.add_argument(
+        "--stall-threshold",
+        type=float,
+        default=0.25,
+        help="When profiling, log the stack of code blocking the event loop longer than this (seconds).",
+    )
     parser.add_argument(
         "--serve",
         action="store_true",
@@ -39,13 +69,39 @@ def parse_args():
         "--input",
         type=str,
         default="",
-        help="If you want to have a single turn only, you can provide an input.",
+        help="If you want to have a single turn only, you can provide an input. A folder or .jsonl file runs a batch.",
     )
     parser.add_argument(
         "--output",
         type=str,
         default="",
-        help="If you want to log the output also into a file, set this to the path.",
+        help="If you want to log the output also into a file, set this to the path (for a batch: a folder or .jsonl).",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        default="markup",
+        choices=["markup", "events"],
+        help="Print the answer as text with <think>/<details> markup or as one json event per line.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Batch (folder or .jsonl input): inputs processed at the same time (default 4). "
+        "Server: worker processes (default `server_workers` from the config, 1).",
+    )
+    parser.add_argument(
+        "--input-pattern",
+        type=str,
+        default="*",
+        help="When the input is a folder, only process files matching this pattern (e.g. `*.md`).",
+    )
+    parser.add_argument(
+        "--output-suffix",
+        type=str,
+        default=".out.md",
+        help="When the input is a folder, the output of `name.ext` is written to `name.ext<suffix>`.",
     )
     parser.add_argument(
         "--agent",
@@ -53,11 +109,27 @@ def parse_args():
         default="agent.auto",
         help="Specify the agent that should be used. Note the prefix 'agent.*' is required. You can also use llms with 'proxy.*'.",
     )
-    return parser.parse_args()
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser(
+        "bench",
+        add_help=False,  # The options are parsed by the bench itself (see `quack-norris bench --help`)
+        help="Fire concurrent chat sessions at a quack-norris server or any OpenAI compatible endpoint.",
+    )
+    args, rest = parser.parse_known_args()
+    if args.command == "bench":
+        args.bench_args = rest
+    elif len(rest) > 0:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    return args
 
 
 def main():
     args = parse_args()
+    if args.command == "bench":
+        from quack_norris.api.bench import bench_cli  # Only the bench needs httpx
+
+        bench_cli(args.bench_args)
+        return
     if args.input != "":
         log_only_warn()  # Reduce logging for single input mode
 
@@ -67,16 +139,46 @@ def main():
 
     config = Config(args.config, overwrites={"debug": args.debug})
     logger.warning(f"Using config {config}")
-    if args.serve:
-        ModelProvider.initialize(config)
+    setup_tracing(config)
+    setup_blob_store(config)
+    if args.profile != "":
+        setup_profiling(args.profile, args.profile_mode, args.profile_every, args.stall_threshold)
+    server_workers = args.workers or config.get("server_workers", 1)
+    if args.serve and server_workers > 1:
+        # Each worker process sets up its own registries
+        profiling = None
+        if args.profile != "":
+            profiling = {
+                "directory": args.profile,
+                "mode": args.profile_mode,
+                "every": args.profile_every,
+                "stall_threshold": args.stall_threshold,
+            }
+        serve_workers(config=config, port=11435, workers=server_workers, profiling=profiling)
+    elif args.serve:
+        # Serve right away and attach LLMs and MCP tools as soon as they are ready
+        wait = config.get("wait_for_backends", False)
+        ModelProvider.initialize(config, wait=False)
         ProxyChatHandlerProvider.setup_from_config(config)
-        MultiAgentRunner.setup_from_config(config)
+        MultiAgentRunner.setup_from_config(config, wait=wait)
+        if wait:
+            ModelProvider.wait_until_ready()
+        if config.get("watch_config", True):
+            config.watch()  # Apply changes of llms, mcps, proxy and workspaces without a restart
+        preload_models(config)
         serve_openai_api(config=config, port=11435)
     elif args.input != "":
-        ModelProvider.initialize(config)
+        # Connect LLMs in the background while MCP tools are discovered
+        ModelProvider.initialize(config, wait=False)
         ProxyChatHandlerProvider.setup_from_config(config)
         MultiAgentRunner.setup_from_config(config)
-        cli_chat(args.agent, args.input, args.output)
+        ModelProvider.wait_until_ready()
+        if os.path.isdir(args.input) or args.input.endswith(".jsonl"):
+            cli_batch(
+                args.agent, args.input, args.output, args.workers or 4, args.input_pattern, args.output_suffix
+            )
+        else:
+            cli_chat(args.agent, args.input, args.output, args.output_format)
     else:
         create_ui(config)
 
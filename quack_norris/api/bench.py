@@ -0,0 +1,220 @@
+from typing import Any
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from quack_norris.api.server import ChatCompletionRequest
+from quack_norris.core.llm.types import ChatMessage
+
+
+def bench_cli(argv: list[str]) -> None:
+    """Run `quack-norris bench`, a load generator for OpenAI compatible chat endpoints."""
+    args = _parse_args(argv)
+    sessions = load_sessions(args.prompts, args.model)
+    if args.sessions > 0:
+        sessions = [sessions[i % len(sessions)] for i in range(args.sessions)]
+    results = asyncio.run(run_load(sessions, args))
+    summary = summarize(results)
+    summary["config"] = {
+        "url": args.url,
+        "stream": not args.no_stream,
+        "rate": args.rate,
+        "concurrency": args.concurrency if args.rate <= 0 else None,
+    }
+    _print_summary(summary)
+    if args.out != "":
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"summary": summary, "requests": results}, indent=2))
+
+
+def load_sessions(path: str, default_model: str) -> list[dict[str, Any]]:
+    """
+    Read chat sessions from a jsonl file, one session per line.
+
+    A line has a `model` (optional) and either `messages` (sent as is), `turns`
+    (user messages of a multi-turn session), `prompt` or a `title` and `body`.
+    """
+    sessions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() == "":
+                continue
+            spec = json.loads(line)
+            if "messages" in spec:
+                history = [ChatMessage(**message) for message in spec["messages"]]
+                turns = [history.pop()] if len(history) > 0 else []
+            elif "turns" in spec:
+                history = []
+                turns = [ChatMessage(role="user", content=turn) for turn in spec["turns"]]
+            elif "prompt" in spec:
+                history = []
+                turns = [ChatMessage(role="user", content=spec["prompt"])]
+            else:
+                history = []
+                text = "\n\n".join(spec[key] for key in ["title", "body"] if key in spec)
+                turns = [ChatMessage(role="user", content=text)]
+            sessions.append({"model": spec.get("model", default_model), "history": history, "turns": turns})
+    if len(sessions) == 0:
+        raise ValueError(f"No sessions found in `{path}`.")
+    return sessions
+
+
+async def run_load(sessions: list[dict[str, Any]], args) -> list[dict[str, Any]]:
+    """Run all sessions closed loop (fixed concurrency) or open loop (poisson arrivals at `rate`)."""
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key != "" else {}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    results: list[dict[str, Any]] = []
+    async with httpx.AsyncClient(
+        base_url=args.url, headers=headers, timeout=args.timeout, limits=limits
+    ) as client:
+        start = time.perf_counter()
+
+        async def _session(idx: int, session: dict[str, Any]) -> None:
+            results.extend(await run_session(client, idx, session, args, start))
+
+        if args.rate > 0:
+            rng = random.Random(args.seed)
+            tasks = []
+            for idx, session in enumerate(sessions):
+                tasks.append(asyncio.create_task(_session(idx, session)))
+                await asyncio.sleep(rng.expovariate(args.rate))
+            await asyncio.gather(*tasks)
+        else:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def _limited(idx: int, session: dict[str, Any]) -> None:
+                async with semaphore:
+                    await _session(idx, session)
+
+            await asyncio.gather(*[_limited(idx, session) for idx, session in enumerate(sessions)])
+    return results
+
+
+async def run_session(
+    client: httpx.AsyncClient, idx: int, session: dict[str, Any], args, start: float
+) -> list[dict[str, Any]]:
+    """Send the turns of a session one after another, each with the answers so far."""
+    history: list[ChatMessage] = list(session["history"])
+    results = []
+    for turn, message in enumerate(session["turns"]):
+        history.append(message)
+        request = ChatCompletionRequest(
+            model=session["model"],
+            messages=history,
+            stream=not args.no_stream,
+            workspace=args.workspace,
+            max_tokens=args.max_tokens if args.max_tokens > 0 else -1,
+        )
+        result = await send_request(client, request)
+        result.update(session=idx, turn=turn, start=result["start"] - start)
+        results.append(result)
+        if result["error"] is not None:
+            break
+        history.append(ChatMessage(role="assistant", content=result.pop("text")))
+    for result in results:
+        result.pop("text", None)
+    return results
+
+
+async def send_request(client: httpx.AsyncClient, request: ChatCompletionRequest) -> dict[str, Any]:
+    # Only send fields that differ from the defaults, other endpoints reject unknown fields like `workspace`
+    body = request.model_dump(mode="json", exclude_defaults=True)
+    body["stream"] = request.stream
+    start = time.perf_counter()
+    first: float | None = None
+    chunks = 0
+    text: list[str] = []
+    error = None
+    try:
+        if request.stream:
+            async with client.stream("POST", "/chat/completions", json=body) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    choices = json.loads(line[len("data: "):]).get("choices", [])
+                    content = choices[0].get("delta", {}).get("content") if len(choices) > 0 else None
+                    if not content:
+                        continue
+                    if first is None:
+                        first = time.perf_counter()
+                    chunks += 1
+                    text.append(content)
+        else:
+            response = await client.post("/chat/completions", json=body)
+            response.raise_for_status()
+            text.append(response.json()["choices"][0]["message"]["content"] or "")
+            chunks = 1
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    end = time.perf_counter()
+    return {
+        "start": start,
+        "latency": end - start,
+        "ttft": (first if first is not None else end) - start,
+        "chunks": chunks,
+        "chars": sum(len(t) for t in text),
+        "text": "".join(text),
+        "error": error,
+    }
+
+
+def summarize(results: list[dict[str, Any]]) -> dict[str, Any]:
+    ok = [r for r in results if r["error"] is None]
+    duration = max((r["start"] + r["latency"] for r in results), default=0.0)
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok]
+    summary: dict[str, Any] = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "sessions": len(set(r["session"] for r in results)),
+        "duration": duration,
+        "throughput": len(ok) / duration if duration > 0 else 0.0,
+        "chunks_per_second": sum(r["chunks"] for r in ok) / duration if duration > 0 else 0.0,
+    }
+    for p in [50, 90, 99]:
+        summary[f"latency_p{p}"] = _percentile(latencies, p)
+        summary[f"ttft_p{p}"] = _percentile(ttfts, p)
+    return summary
+
+
+## Internals
+def _parse_args(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="quack-norris bench",
+        description="Fire concurrent chat sessions at a quack-norris server or any OpenAI compatible endpoint.",
+    )
+    parser.add_argument("prompts", type=str, help="A jsonl file with one chat session per line.")
+    parser.add_argument("--url", type=str, default="http://localhost:11435", help="Base url of the endpoint (e.g. `https://api.openai.com/v1`).")
+    parser.add_argument("--api-key", type=str, default="", help="Sent as bearer token.")
+    parser.add_argument("--model", type=str, default="agent.auto", help="Model/agent for sessions that do not specify one.")
+    parser.add_argument("--sessions", type=int, default=0, help="Number of sessions to run, cycling through the file (default: each line once).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Sessions running at the same time (closed loop).")
+    parser.add_argument("--rate", type=float, default=0.0, help="Start sessions at this rate per second regardless of completions (open loop).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the open loop arrivals.")
+    parser.add_argument("--no-stream", action="store_true", help="Request complete responses instead of streams.")
+    parser.add_argument("--max-tokens", type=int, default=0, help="Limit the tokens per response.")
+    parser.add_argument("--workspace", type=str, default="", help="Workspace to use (quack-norris only).")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Timeout per request in seconds.")
+    parser.add_argument("--out", type=str, default="", help="Write the summary and all requests as json to this file.")
+    return parser.parse_args(argv)
+
+
+def _print_summary(summary: dict[str, Any]) -> None:
+    print(f"Sessions:    {summary['sessions']} ({summary['requests']} requests, {summary['errors']} errors)")
+    print(f"Duration:    {summary['duration']:.2f}s")
+    print(f"Throughput:  {summary['throughput']:.2f} req/s, {summary['chunks_per_second']:.1f} chunks/s")
+    for label, metric in [("Latency:", "latency"), ("TTFT:", "ttft")]:
+        values = " ".join(f"p{p} {summary[f'{metric}_p{p}'] * 1000:.1f}ms" for p in [50, 90, 99])
+        print(f"{label:12} {values}")
+
+
+def _percentile(values: list[float], p: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
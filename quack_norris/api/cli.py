@@ -1,13 +1,20 @@
+from typing import Any, Optional
+import fnmatch
+import json
 import os
 import asyncio
+import time
 
 from quack_norris.logging import logger
 from quack_norris.core.llm.types import ChatMessage
-from quack_norris.core.output_writer import OutputWriter
+from quack_norris.core.output_writer import OutputBuffer, OutputWriter
+from quack_norris.core.output_encoders import RawEncoder
 from quack_norris.api.chat_handler import ChatHandlerRegistry
+from quack_norris.core.tracing import span
+from quack_norris.core.profiling import profile, watch_event_loop
 
 
-def cli_chat(agent: str, text: str, log_path: str):
+def cli_chat(agent: str, text: str, log_path: str, output_format: str = "markup"):
     try:
         chat_handler = ChatHandlerRegistry.get_handler(agent)
     except RuntimeError as e:
@@ -16,13 +23,175 @@ def cli_chat(agent: str, text: str, log_path: str):
             f"The selected agent is not a valid choice.\n  Select from:{agent_names}"
         )
         exit(22)  # Invalid argument
-    output = OutputWriter()
+    buffer: Optional[OutputBuffer] = OutputBuffer(spill_chars=_SPILL_CHARS) if log_path != "" else None
+    output = OutputWriter(
+        echo_encoder=RawEncoder() if output_format == "events" else None,
+        buffer=buffer if buffer is not None else False,
+    )
     history = []
     if os.path.isfile(text):
         with open(text, "r", encoding="utf-8") as f:
             text = f.read()
     history.append(ChatMessage(role="user", content=text))
-    asyncio.run(chat_handler(history=history, workspace="", output=output))
-    if log_path != "":
+    async def _run():
+        watch_event_loop()
+        with span("handler", model=agent), profile(f"cli-{agent}"):
+            await chat_handler(history=history, workspace="", output=output)
+
+    asyncio.run(_run())
+    if buffer is not None:
         with open(log_path, "w", encoding="utf-8") as f:
-            f.write(output.output_buffer)
+            buffer.copy_to(f)
+        buffer.close()
+
+
+def cli_batch(
+    agent: str, input_path: str, output_path: str, workers: int = 4,
+    pattern: str = "*", output_suffix: str = ".out.md",
+):
+    """
+    Process many inputs concurrently in one process, `workers` chats at a time.
+
+    The input is either a directory (one item per file matching `pattern`, the output
+    is written next to it or into the `output_path` directory as `<file name><output_suffix>`)
+    or a jsonl file (one item per line, results are appended to `output_path`).
+    Items that finished in a previous run are skipped, so an interrupted batch can be resumed.
+    """
+    if os.path.isdir(input_path):
+        output_dir = output_path if output_path != "" else input_path
+        os.makedirs(output_dir, exist_ok=True)
+        items = _items_from_directory(agent, input_path, pattern, output_dir, output_suffix)
+        store = _store_file
+    else:
+        if output_path == "":
+            output_path = os.path.splitext(input_path)[0] + ".results.jsonl"
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        items = _items_from_jsonl(agent, input_path, output_path)
+        store = _make_store_jsonl(output_path)
+    if len(items) == 0:
+        logger.warning("Nothing to do, all items are already processed.")
+        return
+
+    async def _run():
+        watch_event_loop()
+        semaphore = asyncio.Semaphore(max(workers, 1))
+        finished = 0
+
+        async def _process(item: dict[str, Any]):
+            nonlocal finished
+            async with semaphore:
+                start = time.perf_counter()
+                buffer = OutputBuffer(spill_chars=_SPILL_CHARS)
+                output = OutputWriter(echo=False, buffer=buffer)
+                error = None
+                try:
+                    chat_handler = ChatHandlerRegistry.get_handler(item["agent"])
+                    with span("handler", model=item["agent"], item=item["id"]), profile(f"batch-{item['id']}"):
+                        await chat_handler(history=item["messages"], workspace="", output=output)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                duration = time.perf_counter() - start
+                try:
+                    store(item, buffer, error, duration)
+                except Exception as e:  # Report it for this item, do not abort the batch
+                    error = f"Failed to store the output, {type(e).__name__}: {e}"
+                finally:
+                    buffer.close()
+                finished += 1
+                status = "done" if error is None else f"failed ({error})"
+                logger.bind(progress=True).info(f"[{finished}/{len(items)}] {item['id']}: {status} in {duration:.1f}s")
+
+        await asyncio.gather(*[_process(item) for item in items])
+
+    asyncio.run(_run())
+
+
+## Internals
+# Outputs longer than this are kept in a temporary file until they are written
+_SPILL_CHARS = 1_000_000
+
+
+def _items_from_directory(
+    agent: str, input_dir: str, pattern: str, output_dir: str, output_suffix: str
+) -> list[dict[str, Any]]:
+    items = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if not os.path.isfile(path) or name.endswith(output_suffix) or not fnmatch.fnmatch(name, pattern):
+            continue
+        # Keep the extension, so `a.md` and `a.txt` do not share an output
+        output_path = os.path.join(output_dir, name + output_suffix)
+        if os.path.exists(output_path):
+            continue  # Already processed
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        items.append({
+            "id": name,
+            "agent": agent,
+            "messages": [ChatMessage(role="user", content=text)],
+            "output_path": output_path,
+        })
+    return items
+
+
+def _items_from_jsonl(agent: str, input_path: str, results_path: str) -> list[dict[str, Any]]:
+    """Items have an `id`, optionally an `agent` and either `messages`, a `prompt` or a `title` and `body`."""
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Interrupted while writing, the item is processed again
+                if result.get("error", None) is None:
+                    done.add(result["id"])
+    items = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for idx, line in enumerate(f):
+            if line.strip() == "":
+                continue
+            spec = json.loads(line)
+            item_id = str(spec.get("id", spec.get("request_id", idx)))
+            if item_id in done:
+                continue
+            if "messages" in spec:
+                messages = [ChatMessage(**message) for message in spec["messages"]]
+            else:
+                text = spec.get("prompt", "\n\n".join(spec[key] for key in ["title", "body"] if key in spec))
+                messages = [ChatMessage(role="user", content=text)]
+            items.append({"id": item_id, "agent": spec.get("agent", agent), "messages": messages})
+    return items
+
+
+def _store_file(item: dict[str, Any], output: OutputBuffer, error: str | None, duration: float) -> None:
+    if error is not None:
+        return  # Retried in the next run
+    # Write atomically, so an interrupted write is not mistaken for a finished item
+    tmp_path = f"{item['output_path']}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        output.copy_to(f)
+    os.replace(tmp_path, item["output_path"])
+
+
+def _make_store_jsonl(results_path: str):
+    def _store(item: dict[str, Any], output: OutputBuffer, error: str | None, duration: float) -> None:
+        result = {"id": item["id"], "agent": item["agent"], "error": error, "duration": duration}
+        # Stream the output into the json string, a spilled output is never loaded at once
+        with open(results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result)[:-1] + ', "output": "')
+            output.copy_to(_JsonStringWriter(f))
+            f.write('"}\n')
+    return _store
+
+
+class _JsonStringWriter:
+    """Writes text escaped for the inside of a json string."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, text: str) -> None:
+        self._f.write(json.dumps(text)[1:-1])
@@ -1,21 +1,27 @@
+from contextlib import asynccontextmanager
 from time import time
-from typing import Any, List, Optional
+from typing import Any, AsyncGenerator, Awaitable, Callable, List, Optional
 from uuid import uuid4
 import asyncio
 import json
 import logging
 
-from pydantic import BaseModel
-from fastapi import FastAPI, Request, status
+from pydantic import BaseModel, ValidationError
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import StreamingResponse
 import uvicorn
 
 from quack_norris.api.chat_handler import ChatHandlerRegistry
+from quack_norris.api.single_flight import Broadcaster, SingleFlight
 from quack_norris.core.llm.types import ChatMessage
 from quack_norris.core.output_writer import OutputWriter
+from quack_norris.core.output_encoders import MarkupEncoder, SSEEncoder
+from quack_norris.core.metrics import REQUESTS_IN_FLIGHT, STREAM_QUEUE_DEPTH, render_metrics
+from quack_norris.core.tracing import recent_traces, span
+from quack_norris.core.profiling import profile, watch_event_loop
 from quack_norris.logging import logger
 from quack_norris.config import Config
 
@@ -29,7 +35,12 @@ class ChatCompletionRequest(BaseModel):
 
 
 def create_openai_api(config: Config, debug=False) -> FastAPI:
-    app = FastAPI(title="OpenAI Server")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        watch_event_loop()
+        yield
+
+    app = FastAPI(title="OpenAI Server", lifespan=lifespan)
 
     # Set up logging
     logger = logging.getLogger("openai_server")
@@ -53,59 +64,75 @@ def create_openai_api(config: Config, debug=False) -> FastAPI:
         allow_credentials=True,
     )
 
-    async def _wrap_chat_generator(stream, model):
-        i = 0
-        async for token in stream:
-            chunk = {
-                "id": i,
-                "object": "chat.completion.chunk",
-                "created": int(time()),
-                "model": model,
-                "choices": [{"delta": {"content": token, "role": "assistant"}}],
-            }
-            i += 1
+    # Identical requests in flight at the same time share one generation
+    single_flight = SingleFlight(enabled=config.get("coalesce_requests", True))
+    request_timeout = config.get("request_timeout", 600)
+    STREAM_QUEUE_DEPTH.set_function(single_flight.backlog)
+
+    async def _wrap_chat_generator(events, model):
+        encoder = SSEEncoder(model)
+        async for event in events:
+            frame = encoder.encode(event)
+            if frame == "":
+                continue
             if debug:
-                logger.debug(f"CHUNK: {json.dumps(chunk)}")
-            yield f"data: {json.dumps(chunk)}\n\n"
+                logger.debug(f"CHUNK: {frame.strip()}")
+            yield frame
         if debug:
             logger.debug("CHUNK: [DONE]")
-        yield "data: [DONE]\n\n"
+        yield SSEEncoder.DONE
+
+    def _resolve_workspace(workspace: str | None) -> str:
+        if workspace is None:  # Use default workspace if none provided
+            workspace = list(config.get("workspaces", {}).keys())[0]
+        if workspace not in config.get("workspaces", {}):  # Use no workspace if invalid provided
+            workspace = ""
+        return workspace
+
+    async def _run_handler(request: ChatCompletionRequest, workspace: str, output: OutputWriter) -> str:
+        """Run the chat handler of the requested model/agent, returns the finish reason."""
+        reason = "stop"
+        try:
+            with span("handler", model=request.model, workspace=workspace), profile(f"request-{request.model}"):
+                await asyncio.wait_for(
+                    ChatHandlerRegistry.get_handler(request.model)(
+                        history=request.messages, workspace=workspace, output=output
+                    ),
+                    timeout=request_timeout,
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Request to `{request.model}` exceeded the deadline of {request_timeout}s")
+            await output.default(f"The request was aborted, as it took longer than {request_timeout}s.")
+            reason = "timeout"
+        except Exception as e:
+            await output.default(f"Unexpected error occured:\n\n```\n{e}\n```\n")
+            reason = "error"
+        await output.clear()
+        return reason
 
     @app.post("/chat/completions")
     async def chat_completions(request: ChatCompletionRequest):
         if debug:
             logger.debug(f"REQUEST: {request}")
         reason = "stop"
-        workspace = request.workspace
-        if workspace is None:  # Use default workspace if none provided
-            workspace = list(config.get("workspaces", {}).keys())[0]
-        if workspace not in config.get("workspaces", {}):  # Use no workspace if invalid provided
-            workspace = ""
+        workspace = _resolve_workspace(request.workspace)
         try:
-            async def generator():
-                queue = asyncio.Queue(maxsize=1)
-
-                # Run the graph in a background task
-                async def run_graph():
-                    output = OutputWriter(queue=queue)
-                    try:
-                        await ChatHandlerRegistry.get_handler(request.model)(
-                            history=request.messages, workspace=workspace, output=output
-                        )
-                    except Exception as e:
-                        await output.default(f"Unexpected error occured:\n\n```\n{e}\n```\n")
-                    await output.clear()
-                    await queue.put(None)  # Sentinel to signal completion
-
-                asyncio.create_task(run_graph())
+            # Run the graph in a background task
+            async def run_graph(queue: Broadcaster):
+                # Subscribers encode the events for their transport
+                output = OutputWriter(echo=False, events=queue, buffer=False)
+                await _run_handler(request, workspace, output)
+                await queue.put(None)  # Sentinel to signal completion
 
-                while True:
-                    chunk: str | None = await queue.get()
-                    if chunk == "":
-                        continue
-                    if chunk is None:
-                        break
-                    yield chunk
+            broadcaster = single_flight.join(_request_key(request, workspace), run_graph)
+
+            async def generator():
+                REQUESTS_IN_FLIGHT.inc()
+                try:
+                    async for event in broadcaster.subscribe():
+                        yield event
+                finally:
+                    REQUESTS_IN_FLIGHT.dec()
 
             response = generator()
         except RuntimeError as e:
@@ -113,15 +140,15 @@ def create_openai_api(config: Config, debug=False) -> FastAPI:
             reason = "error"
         if request.stream:
             if isinstance(response, str):
-                response = [response]
+                response = _as_events(response)
             return StreamingResponse(
                 _wrap_chat_generator(response, request.model),
                 media_type="text/event-stream",
             )
         if not isinstance(response, str):
-            response_str: str = ""
-            async for chunk in response:
-                response_str += chunk
+            markup = MarkupEncoder()
+            chunks: list[str] = [markup.encode(event) async for event in response]
+            response_str = "".join(chunks)
         else:
             response_str = response
         response_obj = {
@@ -140,6 +167,82 @@ def create_openai_api(config: Config, debug=False) -> FastAPI:
             logger.debug(f"RESPONSE: {response_obj}")
         return response_obj
 
+    @app.websocket("/ws")
+    async def chat_websocket(websocket: WebSocket):
+        """
+        Multiplexes any number of concurrent chats over one connection.
+
+        The client sends `{"type": "chat", "id": ..., "model": ..., "messages": [...], "workspace": ...}`
+        to start a chat and `{"type": "cancel", "id": ...}` to stop it. The server answers with
+        the typed events of the `OutputWriter` tagged with the chat `id`, ending each chat
+        with `{"type": "done", "id": ..., "reason": "stop" | "timeout" | "error" | "cancelled"}`.
+        """
+        await websocket.accept()
+        # Bounded, so a slow client slows its chats down instead of the events piling up
+        outgoing: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=_WEBSOCKET_QUEUE_SIZE)
+        chats: dict[str, asyncio.Task] = {}
+
+        async def _put(event: dict[str, Any]) -> None:
+            if not outgoing.full():
+                outgoing.put_nowait(event)
+                return
+            # Wait for the client to catch up, but not forever if it is gone
+            put = asyncio.ensure_future(outgoing.put(event))
+            await asyncio.wait([put, sender], return_when=asyncio.FIRST_COMPLETED)
+            if not put.done():
+                put.cancel()
+
+        async def _send():
+            try:
+                while True:
+                    event = await outgoing.get()
+                    await websocket.send_text(json.dumps(event))
+            except (WebSocketDisconnect, RuntimeError):
+                pass  # The client is gone, the receiving side cleans up
+
+        async def _chat(chat_id: str, request: ChatCompletionRequest):
+            output = OutputWriter(echo=False, events=_ChatEvents(_put, chat_id), buffer=False)
+            REQUESTS_IN_FLIGHT.inc()
+            try:
+                reason = await _run_handler(request, _resolve_workspace(request.workspace), output)
+            except asyncio.CancelledError:
+                reason = "cancelled"
+            finally:
+                REQUESTS_IN_FLIGHT.dec()
+                chats.pop(chat_id, None)
+            await _put({"type": "done", "id": chat_id, "reason": reason})
+
+        sender = asyncio.create_task(_send())
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except json.JSONDecodeError as e:
+                    await _put({"type": "error", "id": "", "message": f"Invalid json: {e}"})
+                    continue
+                chat_id = str(message.get("id", ""))
+                if message.get("type") == "cancel":
+                    if chat_id in chats:
+                        chats[chat_id].cancel()
+                    continue
+                if message.get("type") != "chat" or chat_id == "" or chat_id in chats:
+                    await _put({"type": "error", "id": chat_id, "message": "Expected a chat with a new `id`."})
+                    continue
+                try:
+                    request = ChatCompletionRequest.model_validate(message)
+                except ValidationError as e:
+                    await _put({"type": "error", "id": chat_id, "message": str(e)})
+                    continue
+                if debug:
+                    logger.debug(f"WS REQUEST {chat_id}: {request}")
+                chats[chat_id] = asyncio.create_task(_chat(chat_id, request))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in list(chats.values()):
+                task.cancel()
+            sender.cancel()
+
     @app.get("/models")
     def openai_models():
         response = {
@@ -158,6 +261,14 @@ def create_openai_api(config: Config, debug=False) -> FastAPI:
             logger.debug(f"RESPONSE: {response}")
         return response
 
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/debug/traces")
+    def debug_traces(limit: int = 20):
+        return recent_traces(limit)
+
     @app.get("/workspaces")
     def openai_workspaces():
         response = list(config.get("workspaces", {}).keys())
@@ -176,6 +287,30 @@ def create_openai_api(config: Config, debug=False) -> FastAPI:
     return app
 
 
+async def _as_events(text: str) -> AsyncGenerator[dict[str, Any], None]:
+    yield {"type": "token", "text": text}
+
+
+_WEBSOCKET_QUEUE_SIZE = 256  # Events per connection
+
+
+class _ChatEvents:
+    """Tags the events of one chat with its id, so many chats can share one websocket."""
+
+    def __init__(self, put: Callable[[dict[str, Any]], Awaitable[None]], chat_id: str):
+        self._put = put
+        self._chat_id = chat_id
+
+    async def put(self, event: dict[str, Any]) -> None:
+        await self._put(dict(event, id=self._chat_id))
+
+
+def _request_key(request: ChatCompletionRequest, workspace: str) -> str:
+    payload = request.model_dump(mode="json", exclude={"stream", "workspace"})
+    payload["workspace"] = workspace
+    return json.dumps(payload, sort_keys=True, default=str)
+
+
 def serve_openai_api(
     config: Config,
     host: str = "localhost",
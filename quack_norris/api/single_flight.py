@@ -0,0 +1,146 @@
+from typing import Any, AsyncGenerator, Awaitable, Callable
+import asyncio
+import itertools
+
+from quack_norris.core.metrics import GENERATIONS_IN_FLIGHT, REQUESTS_COALESCED
+
+
+class Broadcaster:
+    """
+    Fans out the chunks (e.g. the events of an `OutputWriter`) of one generation to any number of subscribers.
+
+    Implements the `put` of an `asyncio.Queue`, so it can be passed to an `OutputWriter`.
+    Subscribers joining late first receive all chunks produced so far, as long as the
+    stream is `joinable`: once more than `replay_limit` chunks were produced, chunks all
+    subscribers received are dropped. `put` waits while the slowest subscriber is
+    `max_backlog` chunks behind, so a slow client slows down the generation instead of
+    the chunks piling up. `None` ends the stream. When the last subscriber leaves before
+    the stream ended, the generating task is cancelled.
+    """
+
+    def __init__(self, replay_limit: int = 1024, max_backlog: int = 256):
+        self._chunks: list[Any] = []
+        self._start = 0  # Index of the first chunk still kept, the ones before were sent to all subscribers
+        self._replay_limit = replay_limit
+        self._max_backlog = max_backlog
+        self._changed = asyncio.Condition()
+        self._positions: dict[int, int] = {}  # subscriber -> index of next chunk to send
+        self._ids = itertools.count()
+        self._ended = False
+        self.task: asyncio.Task | None = None
+        self.cancelled = False
+
+    @property
+    def ended(self) -> bool:
+        return self._ended
+
+    @property
+    def joinable(self) -> bool:
+        """Whether a new subscriber can still receive the whole stream."""
+        return self._start == 0
+
+    async def put(self, chunk: Any) -> None:
+        async with self._changed:
+            if chunk is not None:  # Never hold back the end of the stream
+                await self._changed.wait_for(lambda: self.backlog < self._max_backlog)
+            self._chunks.append(chunk)
+            self._ended = chunk is None
+            self._trim()
+            self._changed.notify_all()
+        await asyncio.sleep(0)  # Let subscribers consume
+
+    @property
+    def backlog(self) -> int:
+        """Number of chunks the slowest subscriber has not received yet."""
+        if len(self._positions) == 0:
+            return 0
+        return self._start + len(self._chunks) - min(self._positions.values())
+
+    async def close(self) -> None:
+        """End the stream, unless it already ended."""
+        if not self.ended:
+            await self.put(None)
+
+    async def subscribe(self) -> AsyncGenerator[Any, None]:
+        subscriber = next(self._ids)
+        self._positions[subscriber] = self._start
+        try:
+            while True:
+                index = self._positions[subscriber]
+                async with self._changed:
+                    await self._changed.wait_for(lambda: index < self._start + len(self._chunks))
+                    chunks = self._chunks[index - self._start:]
+                for chunk in chunks:
+                    if chunk is None:
+                        return
+                    self._positions[subscriber] += 1
+                    yield chunk
+                async with self._changed:
+                    self._trim()
+                    self._changed.notify_all()  # Wake up a `put` waiting for this subscriber
+        finally:
+            del self._positions[subscriber]
+            # Nobody is listening anymore (e.g. client disconnected), stop generating
+            if len(self._positions) == 0 and not self.ended and self.task is not None:
+                self.cancelled = True
+                self.task.cancel()
+            elif len(self._positions) > 0:
+                self._notify_soon()
+
+    def _trim(self) -> None:
+        # Keep everything while late subscribers may still join, afterwards only what is not sent yet
+        if len(self._positions) == 0 or self._start + len(self._chunks) <= self._replay_limit:
+            return
+        sent = min(self._positions.values()) - self._start
+        if sent > 0:
+            del self._chunks[:sent]
+            self._start += sent
+
+    def _notify_soon(self) -> None:
+        async def _notify():
+            async with self._changed:
+                self._changed.notify_all()  # The slowest subscriber may have left
+        asyncio.ensure_future(_notify())
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests that are in flight at the same time.
+
+    The first request with a key starts the generation, all requests with the same key
+    arriving while it is still `joinable` subscribe to the same `Broadcaster`.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self._enabled = enabled
+        self._inflight: dict[str, Broadcaster] = {}
+        self._active: set[Broadcaster] = set()
+
+    def backlog(self) -> int:
+        """Chunks not yet sent to the slowest subscriber, summed over all running generations."""
+        return sum(broadcaster.backlog for broadcaster in list(self._active))
+
+    def join(self, key: str, generate: Callable[[Broadcaster], Awaitable[None]]) -> Broadcaster:
+        broadcaster = self._inflight.get(key) if self._enabled else None
+        if broadcaster is not None and not broadcaster.cancelled and broadcaster.joinable:
+            REQUESTS_COALESCED.inc()
+            return broadcaster
+
+        broadcaster = Broadcaster()
+        if self._enabled:
+            self._inflight[key] = broadcaster
+
+        async def _run():
+            GENERATIONS_IN_FLIGHT.inc()
+            self._active.add(broadcaster)
+            try:
+                await generate(broadcaster)
+            finally:
+                GENERATIONS_IN_FLIGHT.dec()
+                self._active.discard(broadcaster)
+                if self._inflight.get(key) is broadcaster:
+                    del self._inflight[key]
+                await broadcaster.close()  # Never leave subscribers waiting, e.g. after a cancel
+
+        broadcaster.task = asyncio.create_task(_run())
+        return broadcaster
@@ -0,0 +1,120 @@
+from typing import Any
+import json
+import os
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+from quack_norris.api.server import create_openai_api
+from quack_norris.config import Config
+from quack_norris.core.agents.agent_registry import reload_agents
+from quack_norris.core.agents.skill_registry import reload_skills
+from quack_norris.core.agents.multi_agent_runner import MultiAgentRunner, agent_directories
+from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.llm.warm_up import preload_models
+from quack_norris.core.llm.proxy_chat_handler import ProxyChatHandlerProvider
+from quack_norris.core.discovery_cache import DiscoveryCache
+from quack_norris.core.file_watcher import watch_directory
+from quack_norris.core.tracing import setup_tracing
+from quack_norris.core.blob_store import setup_blob_store
+from quack_norris.core.profiling import setup_profiling
+from quack_norris.logging import logger
+
+
+_SPEC_VARIABLE = "QUACK_NORRIS_WORKER_SPEC"
+
+
+## API
+def serve_workers(
+    config: Config,
+    host: str = "localhost",
+    port: int = 8000,
+    workers: int = 2,
+    debug=False,
+    profiling: dict[str, Any] | None = None,
+):
+    """
+    Serve the api from multiple worker processes (uvicorn spawns one app per worker).
+
+    Every worker builds its own registries from the config (warm from the discovery
+    cache). This process only supervises: it watches the agent directories and
+    broadcasts changes to the workers via a reload stamp file. Caches are shared on
+    disk (`discovery_cache`, `completion_cache` with `disk`).
+    """
+    stamp_path = os.path.join(config.user_home_path, "cache", "workers", f"reload-{port}")
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    _touch(stamp_path)
+
+    # Discover the models once, so the workers start from the cache instead of each asking every backend
+    if DiscoveryCache.from_config(config) is not None:
+        ModelProvider.initialize(config)
+
+    def _broadcast(paths: set[str]) -> None:
+        _touch(stamp_path)
+        logger.info(f"Agents changed ({', '.join(sorted(paths))}), notifying the workers")
+
+    for directory in agent_directories(config):
+        watch_directory(directory, (".agent.md", ".skill.md"), _broadcast)
+
+    os.environ[_SPEC_VARIABLE] = json.dumps({
+        "config": config.name,
+        "overwrites": config.overwrites,
+        "reload_stamp": stamp_path,
+        "debug": debug,
+        "profiling": profiling,
+    })
+    logger.info(f"Starting server with {workers} workers")
+    uvicorn.run("quack_norris.api.workers:create_worker_app", factory=True, host=host, port=port, workers=workers)
+
+
+def create_worker_app() -> FastAPI:
+    """App factory run by every worker process of `serve_workers`."""
+    spec = json.loads(os.environ[_SPEC_VARIABLE])
+    config = Config(spec["config"], overwrites=spec["overwrites"])
+    setup_tracing(config)
+    setup_blob_store(config)
+    if spec["profiling"] is not None:
+        setup_profiling(**spec["profiling"])
+    ModelProvider.initialize(config, wait=False)
+    ProxyChatHandlerProvider.setup_from_config(config)
+    MultiAgentRunner.setup_from_config(config, wait=config.get("wait_for_backends", False), watch=False)
+    if config.get("watch_config", True):
+        config.watch()  # Every worker applies config changes to its own connections
+    preload_models(config)  # Loads are cheap once the first worker loaded the model
+    threading.Thread(
+        target=_follow_reloads,
+        args=(agent_directories(config), spec["reload_stamp"], config.get("worker_reload_interval", 1.0)),
+        daemon=True,
+    ).start()
+    return create_openai_api(config=config, debug=spec["debug"])
+
+
+## Internals
+def _touch(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+
+
+def _read_stamp(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _follow_reloads(directories: list[str], stamp_path: str, interval: float) -> None:
+    """Reload agents and skills whenever the supervisor touched the reload stamp."""
+    stamp = _read_stamp(stamp_path)
+    while True:
+        time.sleep(interval)
+        current = _read_stamp(stamp_path)
+        if current == stamp or current == "":
+            continue
+        stamp = current
+        reload_agents(directories)
+        reload_skills(directories)
+        logger.info(f"Worker {os.getpid()} reloaded agents and skills")
+
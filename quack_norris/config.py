@@ -3,6 +3,7 @@ import json
 import os
 
 from quack_norris.logging import logger
+from quack_norris.core.file_watcher import watch_directory
 
 
 def _load_json(path: str) -> dict[str, Any]:
@@ -18,9 +19,18 @@ class Config:
         self._name = config_name
         self._overwrites = overwrites
         self._update_handlers: list[Callable] = []
+        self._watching = False
         
         self._read()
 
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def overwrites(self) -> dict[str, Any]:
+        return dict(self._overwrites)
+
     @property
     def code_home_path(self) -> str:
         return os.path.abspath(os.path.join(os.path.dirname(__file__), "configs"))
@@ -45,15 +55,36 @@ class Config:
         config.update(**self._overwrites)
         if config.get("debug", False):
             print(json.dumps(config, indent=2))
-        self._data = config
+        changed = {key for key in set(config) | set(self._data) if config.get(key) != self._data.get(key)}
+        self._data = config  # Swapped as a whole, readers see either the old or the new config
         
         # Notify all handlers of the config update
         for handler in self._update_handlers:
-            handler()
+            try:
+                handler(changed)
+            except Exception as e:
+                logger.warning(f"Failed to apply config update: {e}")
     
-    def add_update_handler(self, handler: Callable) -> None:
+    def add_update_handler(self, handler: Callable[[set[str]], None]) -> None:
+        """Call the handler with the changed top level keys, whenever the config is reloaded."""
         self._update_handlers.append(handler)
 
+    def watch(self) -> None:
+        """Reload the config whenever one of its files changes (see `add_update_handler`)."""
+        if self._watching:
+            return
+        self._watching = True
+        for path in dict.fromkeys([self.code_home_path, self.user_home_path, self.local_path]):
+            if os.path.isdir(path):
+                # Editors often write a file in several steps, only reload once they are done
+                watch_directory(path, (os.sep + self._name,), self._reload, recursive=False, debounce=0.5)
+
+    def _reload(self, paths: set[str]) -> None:
+        try:
+            self._read()
+        except Exception as e:
+            logger.warning(f"Keeping the previous config, failed to reload `{self._name}`: {e}")
+
     def save(self) -> None:
         home_config_path = os.path.expanduser("~/.config/quack_norris/")
         user_home_config_path = os.path.join(home_config_path, self._name)
@@ -94,3 +125,4 @@ class Config:
     
     def __str__(self) -> str:
         return json.dumps(self._data, indent=2)
+
@@ -1,12 +1,20 @@
+from functools import partial
 from typing import Callable, List
+import asyncio
 import datetime
 import uuid
 
 from quack_norris.logging import logger
 from quack_norris.core.agents.skill_registry import Skill, get_skill, list_skills
-from quack_norris.core.llm.types import Tool, ToolParameter, ToolCall, ChatMessage
+from quack_norris.core.llm.types import Tool, ToolParameter, ToolCall, Message
 from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.llm.utils import iterate_in_thread
+from quack_norris.core.tools.tool_results import (
+    has_truncated_results, is_read_result, limit_tool_result, read_result_tool
+)
 from quack_norris.core.output_writer import OutputWriter
+from quack_norris.core.metrics import StreamTimer
+from quack_norris.core.tracing import span
 
 
 class Agent:
@@ -23,10 +31,15 @@ class Agent:
             tool_callable=callback,
         )
 
+    @property
+    def model(self) -> str | None:
+        """The model the agent answers with (None if it does not use one)."""
+        return None
+
     def _get_parameters(self) -> dict[str, ToolParameter]:
         return {}
 
-    async def chat(self, messages: list[ChatMessage], output: OutputWriter, available_tools: list[Tool], **kwargs) -> bool:
+    async def chat(self, messages: list[Message], output: OutputWriter, available_tools: list[Tool], **kwargs) -> bool:
         raise RuntimeError("Must be implemented by child implementations!")
 
 
@@ -41,10 +54,14 @@ class SimpleAgent(Agent):
         self._skills = skills or []
         self._system_prompt_last = system_prompt_last
 
-    def _determine_skill(self, history: list[ChatMessage]) -> str | None:
+    @property
+    def model(self) -> str | None:
+        return self._model
+
+    def _determine_skill(self, history: list[Message]) -> str | None:
         skill = None
         for message in history:
-            text = message.text()
+            text = message.text(resolve=False)  # Switches are never in the blob store
             if "Successfully switched to skill: `" in text:
                 for line in text.split("\n"):
                     if "Successfully switched to skill: `" in line:
@@ -72,7 +89,7 @@ class SimpleAgent(Agent):
             tool_callable=_callback,
         )
 
-    async def chat(self, messages: list[ChatMessage], output: OutputWriter, available_tools: List[Tool], **kwargs) -> bool:
+    async def chat(self, messages: list[Message], output: OutputWriter, available_tools: List[Tool], **kwargs) -> bool:
         if "{today}" in self._system_prompt:
             kwargs["today"] = datetime.datetime.now().strftime("%A, %B %d, %Y")
         if "{now}" in self._system_prompt:
@@ -102,6 +119,9 @@ class SimpleAgent(Agent):
                 tool.name, available_tools, f"agent.{self._name}"
             )
         ]
+        # Allow paging through truncated tool results (only on steps that may call tools)
+        if len(available_tools) > 0 and has_truncated_results(messages[-10:]):
+            current_tools.append(read_result_tool())
 
         # Add limitations to agent what it does and encourage handover
         system_prompt += "\n\n## Final Remarks\n"
@@ -114,28 +134,40 @@ class SimpleAgent(Agent):
         system_prompt += "* If you cannot answer a question, because it does not fit to your role and you cannot give it to another agent. Let the user politely know."
 
         # Send request to LLM
-        llm = ModelProvider.get_llm(self._model)
-        response = llm(
-            messages=messages[-10:], # only pass last 10 messages to AI
-            tools=current_tools,
-            system_prompt=system_prompt,
-            stream=True,
-        )
-
-        # Stream the response
-        is_thinking = False
-        for chunk in response.stream:
-            if chunk == "<think>":
-                is_thinking = True
-            if chunk == "</think>":
-                is_thinking = False
-            if not is_thinking:
-                await output.default(chunk, separate=False)
+        with span("llm.chat", model=self._model, agent=self._name) as llm_span:
+            timer = StreamTimer(model=self._model, agent=self._name)
+            llm = ModelProvider.get_llm(self._model)
+            window = messages[-10:]  # only pass last 10 messages to AI
+            request = partial(llm, messages=window, tools=current_tools, system_prompt=system_prompt, stream=True)
+            if any(message.has_blobs() for message in window):
+                response = await asyncio.to_thread(request)  # Loading blobs may read from disk
             else:
-                await output.thought(chunk, separate=False)
+                response = request()
+
+            # Stream the response (close it on cancellation, so the backend stops generating)
+            is_thinking = False
+            try:
+                async for chunk in iterate_in_thread(response.stream):
+                    timer.token()
+                    if chunk == "<think>":
+                        is_thinking = True
+                    if chunk == "</think>":
+                        is_thinking = False
+                    if not is_thinking:
+                        await output.default(chunk, separate=False)
+                    else:
+                        await output.thought(chunk, separate=False)
+            finally:
+                response.close()
+            timer.finish()
+            llm_span.set(
+                time_to_first_token=timer.time_to_first_token or 0.0,
+                tokens=timer.tokens,
+                tool_calls=len(response.tool_calls),
+            )
 
         # Add the response to the history
-        messages.append(ChatMessage(
+        messages.append(Message(
             role="assistant",
             content=response.text,
             tool_calls=response.tool_calls
@@ -144,19 +176,21 @@ class SimpleAgent(Agent):
         # Process tool calls and add their results to the history
         for tool_call in response.tool_calls:
             if isinstance(tool_call, ToolCall):
-                await output.thought(
-                    f"Calling Tool: `{tool_call.tool.name}` with params `{tool_call.params}`"
+                await output.tool_call(tool_call.tool.name, tool_call.params, tool_call.id)
+                with span("tool.call", tool=tool_call.tool.name):
+                    result = tool_call.tool.tool_callable(**tool_call.params)
+                    if hasattr(result, "__await__"):  # Await async tool calls
+                        result = await result
+                # Storing large results hashes and writes them, keep that off the event loop
+                result, message = await asyncio.to_thread(
+                    _tool_result_message, tool_call.tool.name, str(result), tool_call.id
                 )
-                result = tool_call.tool.tool_callable(**tool_call.params)
-                if hasattr(result, "__await__"):  # Await async tool calls
-                    result = await result
-                result = str(result)
-                messages.append(ChatMessage(role="tool", content=result, tool_call_id=tool_call.id))
-                await output.thought(f"Result:\n```\n{result}\n```")
+                messages.append(message)
+                await output.tool_result(tool_call.tool.name, result, tool_call.id)
             else:
                 await output.thought(f"Failed parsing toolcall: `{tool_call}`")
                 result = f"Failed parsing toolcall with error: `{tool_call}`."
-                messages.append(ChatMessage(role="tool", content=result, tool_call_id=str(uuid.uuid4())))
+                messages.append(Message(role="tool", content=result, tool_call_id=str(uuid.uuid4())))
                 await output.thought(f"Result:\n```\n{tool_call}\n```")
 
         await output.default("", separate=False)
@@ -168,6 +202,12 @@ class SimpleAgent(Agent):
         return False
 
 
+def _tool_result_message(tool_name: str, result: str, call_id: str) -> tuple[str, Message]:
+    if not is_read_result(tool_name):
+        result = limit_tool_result(result)
+    return result, Message.from_text("tool", result, tool_call_id=call_id)
+
+
 def _tool_matches(tool_name: str, tool_filters: list[str]) -> bool:
     for filter_str in tool_filters:
         if tool_name == filter_str:
@@ -1,16 +1,20 @@
-from typing import cast
+from types import MappingProxyType
+from typing import Mapping
 import os
 import shutil
+import threading
 import yaml
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 
 from quack_norris.logging import logger
 from quack_norris.core.agents.agent import Agent, SimpleAgent
+from quack_norris.core.file_watcher import ParsedFiles, watch_directory
 
 
-_agents: dict[str, Agent] = {}
+# An immutable snapshot, which is swapped as a whole on changes
+_agents: Mapping[str, Agent] = MappingProxyType({})
+_directories: list[str] = []
 _default_model = None
+_lock = threading.Lock()
 
 
 ## API
@@ -20,26 +24,33 @@ def set_default_agent_llm(default_model: str):
     _default_model = default_model
 
 
-def load_and_watch_agents(agent_directory: str):
+def load_and_watch_agents(agent_directory: str, watch: bool = True):
     """Start watching the agent directory for changes."""
     _ensure_default_agent_exists(agent_directory)
 
     if _default_model is None:
         raise RuntimeError("You must first set a default model before you can load and watch a directory.")
     # Load all agents
-    for root, _, files in os.walk(agent_directory):
-        for file in files:
-            if file.endswith(".agent.md"):
-                agent_path = os.path.join(root, file)
-                _load_agent_from_file(agent_path, agent_directory)
+    with _lock:
+        if agent_directory not in _directories:
+            _directories.append(agent_directory)
+    _rebuild()
+    if not watch:
+        return
     # Watch for changes
-    observer = Observer()
-    observer.schedule(_AgentDirectoryWatcher(agent_directory), agent_directory, recursive=True)
-    observer.start()
+    watch_directory(agent_directory, (".agent.md",), _on_changes)
 
 
-def list_agents() -> dict[str, Agent]:
-    """List all agents in the registry."""
+def reload_agents(agent_directories: list[str]):
+    """Reload all agents from disk (e.g. when another process watches the directories)."""
+    global _directories
+    with _lock:
+        _directories = list(agent_directories)
+    _rebuild()
+
+
+def list_agents() -> Mapping[str, Agent]:
+    """List all agents in the registry (a snapshot, which does not change while it is used)."""
     return _agents
 
 
@@ -64,37 +75,31 @@ def _ensure_default_agent_exists(agent_directory):
                 f"WARNING: Default agent file not found at {default_agent_src}"
             )
 
-def _load_agent_from_file(file_path: str, agent_directory: str):
-    """Load an agent from a `.agent.md` file."""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        parts = content.split("---")
-        if len(parts) < 3 or parts[0].strip() != "":
-            raise ValueError(f"Invalid agent file format. Expected YAML metadata enclosed by '---'. Error in: {file_path}")
-
-        metadata = yaml.safe_load(parts[1])
-        system_prompt = "---".join(parts[2:]).strip()
-
-        name = _derive_agent_name(file_path, agent_directory)
-        tools = metadata.get("tools", [])
-        if isinstance(tools, str):
-            tools = [s.strip() for s in tools.split(",")]
-        skills = metadata.get("skills", [])
-        if isinstance(skills, str):
-            skills = [s.strip() for s in skills.split(",")]
-        _agents[name] = SimpleAgent(
-            name=name,
-            description=metadata.get("description", "No description provided."),
-            system_prompt=system_prompt,
-            tools=tools,
-            skills=skills,
-            model=metadata.get("model", _default_model),
-            system_prompt_last=metadata.get("system_prompt_last", False),
-        )
-    except Exception as e:
-        logger.warning(f"Cannot load agent `{file_path}`. Error occured: {e}")
+def _parse_agent(file_path: str, agent_directory: str, content: str) -> tuple[str, Agent]:
+    """Parse an agent from the content of a `.agent.md` file."""
+    parts = content.split("---")
+    if len(parts) < 3 or parts[0].strip() != "":
+        raise ValueError(f"Invalid agent file format. Expected YAML metadata enclosed by '---'. Error in: {file_path}")
+
+    metadata = yaml.safe_load(parts[1])
+    system_prompt = "---".join(parts[2:]).strip()
+
+    name = _derive_agent_name(file_path, agent_directory)
+    tools = metadata.get("tools", [])
+    if isinstance(tools, str):
+        tools = [s.strip() for s in tools.split(",")]
+    skills = metadata.get("skills", [])
+    if isinstance(skills, str):
+        skills = [s.strip() for s in skills.split(",")]
+    return name, SimpleAgent(
+        name=name,
+        description=metadata.get("description", "No description provided."),
+        system_prompt=system_prompt,
+        tools=tools,
+        skills=skills,
+        model=metadata.get("model", _default_model),
+        system_prompt_last=metadata.get("system_prompt_last", False),
+    )
 
 
 def _derive_agent_name(file_path: str, agent_directory: str) -> str:
@@ -103,26 +108,23 @@ def _derive_agent_name(file_path: str, agent_directory: str) -> str:
     return name.replace("/", ".").replace("\\", ".").replace(".agent.md", "")
 
 
-def _unload_agent_from_file(file_path: str, agent_directory: str):
-    """Remove an agent based on its file path."""
-    del _agents[_derive_agent_name(file_path, agent_directory)]
-
+_parsed_agents: ParsedFiles[Agent] = ParsedFiles(".agent.md", _parse_agent)
 
-class _AgentDirectoryWatcher(FileSystemEventHandler):
-    def __init__(self, agent_directory: str):
-        self.agent_directory = agent_directory
 
-    def on_created(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".agent.md"):
-            _load_agent_from_file(cast(str, event.src_path), self.agent_directory)
-            logger.info(f"Agent added: {event.src_path}")
+def _rebuild() -> None:
+    """Build a new snapshot of all agents, only changed files are parsed again."""
+    global _agents
+    with _lock:
+        previous = _agents
+        current = _agents = MappingProxyType(_parsed_agents.scan(_directories))
+    for name in current.keys() - previous.keys():
+        logger.info(f"Agent added: {name}")
+    for name in previous.keys() - current.keys():
+        logger.info(f"Agent removed: {name}")
+    for name in current.keys() & previous.keys():
+        if current[name] is not previous[name]:
+            logger.info(f"Agent updated: {name}")
 
-    def on_modified(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".agent.md"):
-            _load_agent_from_file(cast(str, event.src_path), self.agent_directory)
-            logger.info(f"Agent updated: {event.src_path}")
 
-    def on_deleted(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".agent.md"):
-            _unload_agent_from_file(cast(str, event.src_path), self.agent_directory)
-            logger.info(f"Agent removed: {event.src_path}")
+def _on_changes(paths: set[str]) -> None:
+    _rebuild()
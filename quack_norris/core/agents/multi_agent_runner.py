@@ -1,14 +1,20 @@
+from typing import Any
 import os
 import asyncio
+import threading
 
 from quack_norris.config import Config
 from quack_norris.logging import logger
 from quack_norris.api.chat_handler import ChatHandler, ChatHandlerRegistry, ChatHandlerProvider
 from quack_norris.core.agents.skill_registry import load_and_watch_skills
 from quack_norris.core.agents.agent_registry import set_default_agent_llm, load_and_watch_agents, list_agents, get_agent
-from quack_norris.core.llm.types import ChatMessage, Tool
+from quack_norris.core.llm.types import ChatMessage, Message, Tool, to_messages
 from quack_norris.core.output_writer import OutputWriter
-from quack_norris.core.tools.mcp import initialize_mcp_tools
+from quack_norris.core.tracing import span
+from quack_norris.core.discovery_cache import DiscoveryCache
+from quack_norris.core.tools.mcp import initialize_mcp_tools, invalidate_tool_cache_on_changes, mcp_tool_prefix
+from quack_norris.core.tools.tool_results import setup_tool_results
+from quack_norris.core.llm.warm_up import setup_warm_up, warm_up
 
 
 class MultiAgentRunner(ChatHandlerProvider):
@@ -21,37 +27,105 @@ class MultiAgentRunner(ChatHandlerProvider):
         self._default_agent = default_agent
         self._tools = tools
         self._max_steps = max_steps
+        self._mcps: dict[str, Any] = {}
 
     @staticmethod
-    def setup_from_config(config: Config) -> None:
+    def setup_from_config(config: Config, wait: bool = True, watch: bool = True) -> None:
+        """
+        Load agents, skills and the MCP tools and register the runner.
+
+        With `wait=False` the runner is registered right away and the MCP tools are
+        attached in the background as soon as the MCP servers answered. With
+        `watch=False` the agent directories are not watched (see `reload_agents`).
+        """
+        setup_tool_results(config)
+        setup_warm_up(config)
+        config.add_update_handler(lambda changed: setup_warm_up(config) if "warm_up" in changed else None)
+
+        # Load agents and skills
+        set_default_agent_llm(config.get("default_model", "gemma3:12b"))
+        for full_path in agent_directories(config):
+            load_and_watch_agents(full_path, watch=watch)
+            load_and_watch_skills(full_path, watch=watch)
+        runner = MultiAgentRunner(default_agent="auto", tools=[])
+        ChatHandlerRegistry.register_handler_provider(runner)
+
         # load tools from MCP servers
-        tools: list[Tool] = []
-        if "mcps" in config:
-            tools = asyncio.run(initialize_mcp_tools(config["mcps"]))
-        else:
+        timeout = config.get("startup_timeout", 30.0)
+        cache = DiscoveryCache.from_config(config)
+        runner._mcps = dict(config.get("mcps", {}))
+        config.add_update_handler(
+            lambda changed: runner.update_mcps(config.get("mcps", {}), timeout, cache) if "mcps" in changed else None
+        )
+        # Files edited outside of the tools (e.g. by the user) must not be served from the tool cache
+        invalidate_tool_cache_on_changes(list(config.get("workspaces", {}).values()))
+        config.add_update_handler(
+            lambda changed: invalidate_tool_cache_on_changes(list(config.get("workspaces", {}).values()))
+            if "workspaces" in changed else None
+        )
+        if "mcps" not in config:
             logger.warning(
                 "No MCP servers configured. Add a `mcps` section to your config.json to configure them."
             )
+            return
 
-        # Load agents and skills
-        set_default_agent_llm(config.get("default_model", "gemma3:12b"))
-        for path in [config.code_home_path, config.user_home_path, config.local_path]:
-            full_path = os.path.join(path, "agents")
-            if os.path.exists(full_path):
-                load_and_watch_agents(full_path)
-                load_and_watch_skills(full_path)
-        runner = MultiAgentRunner(default_agent="auto", tools=tools)
-        ChatHandlerRegistry.register_handler_provider(runner)
+        def _discover():
+            tools = asyncio.run(initialize_mcp_tools(config["mcps"], timeout=timeout, cache=cache))
+            runner.add_tools(tools)
+            return tools
+
+        def _revalidate(tools: list[Tool]):
+            fresh_tools = asyncio.run(
+                initialize_mcp_tools(config["mcps"], timeout=timeout, cache=cache, refresh=True)
+            )
+            if _tool_signatures(fresh_tools) != _tool_signatures(tools):
+                logger.info("MCP tools changed since they were cached, updating")
+                runner.replace_tools(tools, fresh_tools)
+
+        if wait:
+            tools = _discover()
+            if cache is not None:
+                threading.Thread(target=_revalidate, args=(tools,), daemon=True).start()
+        else:
+            def _discover_and_revalidate():
+                tools = _discover()
+                if cache is not None:
+                    _revalidate(tools)
+            threading.Thread(target=_discover_and_revalidate, daemon=True).start()
 
     def add_tools(self, tools: list[Tool]):
         for tool in tools:
             if tool not in self._tools:
                 self._tools.append(tool)
 
-    def _determine_agent(self, history: list[ChatMessage]) -> str:
+    def replace_tools(self, old_tools: list[Tool], new_tools: list[Tool]):
+        # Swap the list instead of modifying it, so running chats keep a consistent view
+        self._tools = [tool for tool in self._tools if tool not in old_tools] + new_tools
+
+    def update_mcps(self, mcps: dict[str, Any], timeout: float = 30.0, cache: DiscoveryCache | None = None):
+        """Apply a changed `mcps` config: reconnect added and changed servers, drop the tools of removed ones."""
+        previous = self._mcps
+        self._mcps = dict(mcps)
+        changed = [name for name in set(previous) | set(mcps) if previous.get(name) != mcps.get(name)]
+        if len(changed) == 0:
+            return
+        logger.info(f"MCP servers changed: {', '.join(changed)}")
+        prefixes = tuple(mcp_tool_prefix(name) for name in changed)
+        connect = {name: mcps[name] for name in changed if name in mcps}
+
+        def _reconnect():
+            new_tools = []
+            if len(connect) > 0:
+                new_tools = asyncio.run(initialize_mcp_tools(connect, builtins=False, timeout=timeout, cache=cache))
+            # Running chats keep the tools they started with (see `replace_tools`)
+            self.replace_tools([tool for tool in self._tools if tool.name.startswith(prefixes)], new_tools)
+
+        threading.Thread(target=_reconnect, daemon=True).start()
+
+    def _determine_agent(self, history: list[Message]) -> str:
         agent = self._default_agent
         for message in history:
-            text = message.text()
+            text = message.text(resolve=False)  # Switches are never in the blob store
             if "Successfully switched to agent: `" in text:
                 for line in text.split("\n"):
                     if "Successfully switched to agent: `" in line:
@@ -82,11 +156,12 @@ class MultiAgentRunner(ChatHandlerProvider):
 
     async def chat(
         self,
-        messages: list[ChatMessage],
+        messages: list[ChatMessage] | list[Message],
         workspace: str,
         output: OutputWriter,
         agent_name: str = "",
     ) -> None:
+        history = to_messages(messages)  # Agents work on (and append to) lightweight messages
         # TODO integrate filesystem tool and handle the workspace correctly
         tools = list(self._tools)  # copy so we can locally modify
         kwargs = {}
@@ -99,9 +174,12 @@ class MultiAgentRunner(ChatHandlerProvider):
                     nonlocal agent_name
                     nonlocal kwargs
                     if agent in list_agents().keys():
+                        if _agent_model(agent) != _agent_model(agent_name):
+                            warm_up(_agent_model(agent), reason="switch")  # Load while this step finishes
                         agent_name = agent
                         kwargs = args
                         logger.info(f"Successfully switched to agent: `{agent}`")
+                        await output.agent_switch(agent)
                         return f"Successfully switched to agent: `{agent}`"
                     else:
                         logger.info(
@@ -111,16 +189,42 @@ class MultiAgentRunner(ChatHandlerProvider):
 
                 return _callback
 
-            agent_name = self._determine_agent(messages)
+            agent_name = self._determine_agent(history)
             tools += [
                 agent.fill_tool_description(_switch_tool(key))
                 for key, agent in list_agents().items()
             ]
 
-        for step in range(max(self._max_steps, 1)):
-            current_tools: list[Tool] = tools if step < self._max_steps - 1 else []
-            is_done: bool = await get_agent(agent_name).chat(
-                messages, output, current_tools, **kwargs
-            )
-            if is_done:
-                return
+        warm_up(_agent_model(agent_name), reason="request")
+        try:
+            for step in range(max(self._max_steps, 1)):
+                current_tools: list[Tool] = tools if step < self._max_steps - 1 else []
+                try:
+                    with span("agent.step", agent=agent_name, step=step):
+                        is_done: bool = await get_agent(agent_name).chat(
+                            history, output, current_tools, **kwargs
+                        )
+                except asyncio.CancelledError:
+                    logger.info(f"Chat with agent `{agent_name}` cancelled in step {step}")
+                    raise
+                if is_done:
+                    return
+        finally:
+            warm_up(_agent_model(agent_name), reason="keep_alive")
+
+
+def agent_directories(config: Config) -> list[str]:
+    """The existing `agents` directories, in the order in which they overwrite each other."""
+    directories = [
+        os.path.join(path, "agents") for path in [config.code_home_path, config.user_home_path, config.local_path]
+    ]
+    return [directory for directory in directories if os.path.exists(directory)]
+
+
+def _agent_model(agent_name: str) -> str | None:
+    agent = list_agents().get(agent_name, None)
+    return agent.model if agent is not None else None
+
+
+def _tool_signatures(tools: list[Tool]) -> list[tuple[str, str, dict]]:
+    return [(tool.name, tool.description, dict(tool.parameters)) for tool in tools]
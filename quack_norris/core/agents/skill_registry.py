@@ -1,10 +1,11 @@
+from types import MappingProxyType
+from typing import Mapping, Optional, NamedTuple
 import os
+import threading
 import yaml
-from typing import Dict, Optional, NamedTuple
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 
 from quack_norris.logging import logger
+from quack_norris.core.file_watcher import ParsedFiles, watch_directory
 
 
 class Skill(NamedTuple):
@@ -14,26 +15,36 @@ class Skill(NamedTuple):
     prompt: str
 
 
-_skills: Dict[str, Skill] = {}
+# An immutable snapshot, which is swapped as a whole on changes
+_skills: Mapping[str, Skill] = MappingProxyType({})
+_directories: list[str] = []
+_lock = threading.Lock()
 
 
 ## API
-def load_and_watch_skills(skill_directory: str):
+def load_and_watch_skills(skill_directory: str, watch: bool = True):
     """Start watching the skill directory for changes."""
     # Load the skills
-    for root, _, files in os.walk(skill_directory):
-        for file in files:
-            if file.endswith(".skill.md"):
-                skill_path = os.path.join(root, file)
-                _load_skill_from_file(skill_path, skill_directory)
+    with _lock:
+        if skill_directory not in _directories:
+            _directories.append(skill_directory)
+    _rebuild()
+    if not watch:
+        return
     # Watch for changes
-    _observer = Observer()
-    _observer.schedule(_SkillFileChangeHandler(skill_directory), skill_directory, recursive=True)
-    _observer.start()
+    watch_directory(skill_directory, (".skill.md",), _on_changes)
 
 
-def list_skills() -> dict[str, Skill]:
-    """List all skills in the registry."""
+def reload_skills(skill_directories: list[str]):
+    """Reload all skills from disk (e.g. when another process watches the directories)."""
+    global _directories
+    with _lock:
+        _directories = list(skill_directories)
+    _rebuild()
+
+
+def list_skills() -> Mapping[str, Skill]:
+    """List all skills in the registry (a snapshot, which does not change while it is used)."""
     return _skills
 
 
@@ -43,31 +54,25 @@ def get_skill(name: str) -> Optional[Skill]:
 
 
 ## Internals
-def _load_skill_from_file(path: str, skill_directory: str):
-    """Load a single skill from a .skill.md file."""
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        parts = content.split("---")
-        if len(parts) < 3 or parts[0].strip() != "":
-            raise ValueError(f"Invalid skill file format. Expected YAML metadata enclosed by '---'. Error in: {path}")
-
-        metadata = yaml.safe_load(parts[1])
-        prompt = "---".join(parts[2:]).strip()
-
-        skill_name = _derive_skill_name(path, skill_directory)
-        tools = metadata.get("tools", [])
-        if isinstance(tools, str):
-            tools = [s.strip() for s in tools.split(",")]
-        _skills[skill_name] = Skill(
-            name=skill_name,
-            description=metadata.get("description", ""),
-            tools=tools,
-            prompt=prompt,
-        )
-    except Exception as e:
-        logger.warning(f"Cannot load skill `{path}`. Error occured: {e}")
+def _parse_skill(path: str, skill_directory: str, content: str) -> tuple[str, Skill]:
+    """Parse a single skill from the content of a .skill.md file."""
+    parts = content.split("---")
+    if len(parts) < 3 or parts[0].strip() != "":
+        raise ValueError(f"Invalid skill file format. Expected YAML metadata enclosed by '---'. Error in: {path}")
+
+    metadata = yaml.safe_load(parts[1])
+    prompt = "---".join(parts[2:]).strip()
+
+    skill_name = _derive_skill_name(path, skill_directory)
+    tools = metadata.get("tools", [])
+    if isinstance(tools, str):
+        tools = [s.strip() for s in tools.split(",")]
+    return skill_name, Skill(
+        name=skill_name,
+        description=metadata.get("description", ""),
+        tools=tools,
+        prompt=prompt,
+    )
 
 
 def _derive_skill_name(file_path: str, skill_directory: str) -> str:
@@ -76,26 +81,23 @@ def _derive_skill_name(file_path: str, skill_directory: str) -> str:
     return name.replace("/", ".").replace("\\", ".").replace(".skill.md", "")
 
 
-def _unload_skill_from_file(file_path: str, skill_directory: str):
-    """Remove a skill based on its file path."""
-    del _skills[_derive_skill_name(file_path, skill_directory)]
-
+_parsed_skills: ParsedFiles[Skill] = ParsedFiles(".skill.md", _parse_skill)
 
-class _SkillFileChangeHandler(FileSystemEventHandler):
-    def __init__(self, skill_directory: str):
-        self._skill_directory = skill_directory
 
-    def on_modified(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".skill.md"):
-            _load_skill_from_file(event.src_path, self._skill_directory)
-            logger.info(f"Skill added: {event.src_path}")
+def _rebuild() -> None:
+    """Build a new snapshot of all skills, only changed files are parsed again."""
+    global _skills
+    with _lock:
+        previous = _skills
+        current = _skills = MappingProxyType(_parsed_skills.scan(_directories))
+    for name in current.keys() - previous.keys():
+        logger.info(f"Skill added: {name}")
+    for name in previous.keys() - current.keys():
+        logger.info(f"Skill removed: {name}")
+    for name in current.keys() & previous.keys():
+        if current[name] is not previous[name]:
+            logger.info(f"Skill updated: {name}")
 
-    def on_created(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".skill.md"):
-            _load_skill_from_file(event.src_path, self._skill_directory)
-            logger.info(f"Skill updated: {event.src_path}")
 
-    def on_deleted(self, event):
-        if isinstance(event.src_path, str) and event.src_path.endswith(".skill.md"):
-            _unload_skill_from_file(event.src_path, self._skill_directory)
-            logger.info(f"Skill removed: {event.src_path}")
+def _on_changes(paths: set[str]) -> None:
+    _rebuild()
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+import time
+
+from quack_norris.logging import logger
+from quack_norris.config import Config
+
+
+class BlobStore:
+    """
+    Content-addressed store for large texts (e.g. tool outputs of the agents).
+
+    Blobs are referenced by the hash of their content, so the same output
+    is kept once across turns and sessions (and worker processes sharing the path).
+    Recently used blobs stay in an in-memory LRU, all are written to disk.
+    """
+
+    def __init__(self, path: str, min_size: int = 65536, max_memory: int = 64 * 1024 * 1024):
+        self.min_size = min_size
+        self._path = path
+        self._max_memory = max_memory
+        self._memory = 0
+        self._lock = threading.Lock()
+        self._blobs: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def from_config(config: Config) -> "BlobStore | None":
+        settings = config.get("blob_store", {})
+        if not settings.get("enabled", True):
+            return None
+        path = settings.get("path", os.path.join(config.user_home_path, "cache", "blobs"))
+        store = BlobStore(
+            path, min_size=settings.get("min_size", 65536), max_memory=settings.get("max_memory", 64 * 1024 * 1024)
+        )
+        store.prune(settings.get("max_age", 7 * 86400.0))
+        return store
+
+    def put(self, data: str) -> str:
+        """Store the data (if not already stored) and return its reference."""
+        ref = "sha256:" + hashlib.sha256(data.encode("utf-8")).hexdigest()
+        self._remember(ref, data)
+        file_path = self._file_path(ref)
+        if os.path.exists(file_path):
+            os.utime(file_path)  # Keep blobs that are still in use from being pruned
+            return ref
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Write to a temporary file first, so readers never see a partial blob
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+        return ref
+
+    def get(self, ref: str) -> str:
+        with self._lock:
+            data = self._blobs.get(ref)
+            if data is not None:
+                self._blobs.move_to_end(ref)
+                return data
+        try:
+            with open(self._file_path(ref), "r", encoding="utf-8") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Blob `{ref}` not found, it may have been pruned.")
+        self._remember(ref, data)
+        return data
+
+    def prune(self, max_age: float) -> None:
+        """Delete blobs from disk, which were not used for `max_age` seconds."""
+        if not os.path.exists(self._path):
+            return
+        deadline = time.time() - max_age
+        removed = 0
+        for directory, _, files in os.walk(self._path):
+            for name in files:
+                file_path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(file_path) < deadline:
+                        os.remove(file_path)
+                        removed += 1
+                except OSError:
+                    pass  # Removed by another process meanwhile
+        if removed > 0:
+            logger.info(f"Pruned {removed} unused blobs from `{self._path}`")
+
+    def _remember(self, ref: str, data: str) -> None:
+        with self._lock:
+            if ref in self._blobs:
+                self._blobs.move_to_end(ref)
+                return
+            self._blobs[ref] = data
+            self._memory += len(data)
+            while self._memory > self._max_memory and len(self._blobs) > 1:
+                _, evicted = self._blobs.popitem(last=False)
+                self._memory -= len(evicted)
+
+    def _file_path(self, ref: str) -> str:
+        # References may come from a model (e.g. `read_result`), never let them leave the directory
+        if _REF_PATTERN.fullmatch(ref) is None:
+            raise KeyError(f"Invalid blob reference `{ref}`.")
+        digest = ref.split(":", 1)[1]
+        return os.path.join(self._path, digest[:2], digest)
+
+
+_store: BlobStore | None = None
+_REF_PATTERN = re.compile(r"sha256:[0-9a-f]{64}")
+
+
+## API
+def setup_blob_store(config: Config) -> None:
+    """Configure the blob store from the `blob_store` section of the config."""
+    global _store
+    _store = BlobStore.from_config(config)
+
+
+def store_blob(data: str, min_size: int | None = None) -> str | None:
+    """
+    Move a large text to the blob store and return its reference (None if kept inline).
+
+    Texts shorter than `min_size` (default: from the config) are kept inline.
+    """
+    store = _store
+    if store is None or len(data) < (min_size if min_size is not None else store.min_size):
+        return None
+    try:
+        return store.put(data)
+    except OSError as e:
+        logger.warning(f"Failed to store blob, keeping it inline: {e}")
+        return None
+
+
+def load_blob(ref: str) -> str:
+    """Get the text of a blob reference."""
+    if _store is None:
+        raise KeyError(f"Blob `{ref}` not found, the blob store is disabled.")
+    return _store.get(ref)
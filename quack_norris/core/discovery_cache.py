@@ -0,0 +1,86 @@
+from typing import Any
+import hashlib
+import json
+import os
+import threading
+import time
+
+from quack_norris.logging import logger
+from quack_norris.config import Config
+
+
+class DiscoveryCache:
+    """
+    Persisted results of model and tool discovery for warm starts.
+
+    Entries are keyed by a hash of the connection spec (endpoint, command, ...),
+    so changing a connection in the config invalidates its entry. Use `from_config`,
+    it shares one instance per file within the process.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400.0):
+        self._path = path
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = self._load()
+
+    @staticmethod
+    def from_config(config: Config) -> "DiscoveryCache | None":
+        settings = config.get("discovery_cache", {})
+        if not settings.get("enabled", True):
+            return None
+        path = settings.get("path", os.path.join(config.user_home_path, "cache", "discovery.json"))
+        ttl = settings.get("ttl", 86400.0)
+        with _instances_lock:
+            cache = _instances.get((path, ttl))
+            if cache is None:
+                cache = _instances[(path, ttl)] = DiscoveryCache(path, ttl=ttl)
+            return cache
+
+    def get(self, kind: str, spec: Any) -> Any | None:
+        """Get the cached discovery result for the spec or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(_make_key(kind, spec))
+        if entry is None or time.time() - entry["time"] > self._ttl:
+            return None
+        return entry["value"]
+
+    def put(self, kind: str, spec: Any, value: Any) -> None:
+        """Store a discovery result and persist the cache to disk."""
+        with self._lock:
+            self._entries[_make_key(kind, spec)] = {"time": time.time(), "value": value}
+            self._save()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not os.path.exists(self._path):
+            return {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                return json.loads(f.read())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable discovery cache `{self._path}`: {e}")
+            return {}
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            # Keep the entries other processes (e.g. workers) wrote meanwhile, the newest entry wins
+            for key, entry in self._load().items():
+                if key not in self._entries or self._entries[key]["time"] < entry["time"]:
+                    self._entries[key] = entry
+            # Write to a temporary file first, so a crash never leaves a corrupt cache
+            tmp_path = f"{self._path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._entries))
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            logger.warning(f"Failed to write discovery cache `{self._path}`: {e}")
+
+
+_instances: dict[tuple[str, float], DiscoveryCache] = {}
+_instances_lock = threading.Lock()
+
+
+def _make_key(kind: str, spec: Any) -> str:
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode("utf-8"))
+    return f"{kind}:{digest.hexdigest()}"
@@ -0,0 +1,124 @@
+from typing import Callable, Generic, TypeVar
+import hashlib
+import os
+import threading
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from quack_norris.logging import logger
+
+
+T = TypeVar("T")
+
+_observer = None
+_lock = threading.Lock()
+
+
+## API
+def watch_directory(
+    directory: str,
+    suffixes: tuple[str, ...],
+    callback: Callable[[set[str]], None],
+    recursive: bool = True,
+    debounce: float = 0.3,
+) -> None:
+    """
+    Call `callback` with the changed paths ending with one of the `suffixes`.
+
+    All directories are watched by one shared observer. Events are collected until
+    nothing changed for `debounce` seconds (editors fire several events per save),
+    so the callback runs once per batch.
+    """
+    global _observer
+    with _lock:
+        if _observer is None:
+            _observer = Observer()
+            _observer.daemon = True
+            _observer.start()
+        _observer.schedule(_Subscription(suffixes, callback, debounce), directory, recursive=recursive)
+
+
+class ParsedFiles(Generic[T]):
+    """
+    The parsed files (e.g. agents) of some directories, each file is only parsed again if its content changed.
+
+    `parse(path, directory, content)` returns the name and value of a file, later
+    directories overwrite values with the same name of earlier ones.
+    """
+
+    def __init__(self, suffix: str, parse: Callable[[str, str, str], tuple[str, T]]):
+        self._suffix = suffix
+        self._parse = parse
+        # path -> (mtime, size, content hash, name, value)
+        self._files: dict[str, tuple[int, int, str, str, T]] = {}
+        self._lock = threading.Lock()
+
+    def scan(self, directories: list[str]) -> dict[str, T]:
+        with self._lock:
+            values: dict[str, T] = {}
+            files: dict[str, tuple[int, int, str, str, T]] = {}
+            for directory in directories:
+                for root, _, names in os.walk(directory):
+                    for file_name in names:
+                        if not file_name.endswith(self._suffix):
+                            continue
+                        path = os.path.join(root, file_name)
+                        entry = self._load(path, directory)
+                        if entry is not None:
+                            files[path] = entry
+                            values[entry[3]] = entry[4]
+            self._files = files
+            return values
+
+    def _load(self, path: str, directory: str) -> tuple[int, int, str, str, T] | None:
+        cached = self._files.get(path)
+        try:
+            stat = os.stat(path)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            if cached is not None and cached[2] == digest:
+                return (stat.st_mtime_ns, stat.st_size) + cached[2:]  # Touched, but not changed
+            name, value = self._parse(path, directory, content)
+            return (stat.st_mtime_ns, stat.st_size, digest, name, value)
+        except Exception as e:
+            logger.warning(f"Cannot load `{path}`. Error occured: {e}")
+            return cached  # Keep the last version that could be loaded
+
+
+## Internals
+class _Subscription(FileSystemEventHandler):
+    def __init__(self, suffixes: tuple[str, ...], callback: Callable[[set[str]], None], debounce: float):
+        self._suffixes = suffixes
+        self._callback = callback
+        self._debounce = debounce
+        self._pending: set[str] = set()
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        if event.event_type not in ["created", "modified", "moved", "deleted"]:
+            return
+        paths = [str(path) for path in [event.src_path, getattr(event, "dest_path", "")] if path]
+        paths = [path for path in paths if path.endswith(self._suffixes)]
+        if len(paths) == 0:
+            return
+        with self._lock:
+            self._pending.update(paths)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._debounce, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            paths = self._pending
+            self._pending = set()
+        try:
+            self._callback(paths)
+        except Exception as e:
+            logger.warning(f"Failed to handle changes of {sorted(paths)}: {e}")
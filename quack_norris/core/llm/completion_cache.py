@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from typing import Any, Generator
+import hashlib
+import json
+import os
+import threading
+import time
+
+from quack_norris.logging import logger
+from quack_norris.core.llm.types import LLMResponse, Message, Tool, ToolCall
+from quack_norris.config import Config
+
+
+class CompletionCache:
+    """
+    Cache for LLM responses of identical requests (model, messages, tools and system prompt).
+
+    Entries are kept in an in-memory LRU and optionally in a directory on disk, so
+    repeated runs (e.g. evals or cli calls) are answered without calling the backend.
+    """
+
+    def __init__(self, path: str | None = None, ttl: float = 86400.0, max_entries: int = 1024):
+        self._path = path
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    @staticmethod
+    def from_config(config: Config) -> "CompletionCache | None":
+        settings = config.get("completion_cache", {})
+        if not settings.get("enabled", False):
+            return None
+        path = None
+        if settings.get("disk", True):
+            path = settings.get("path", os.path.join(config.user_home_path, "cache", "completions"))
+        return CompletionCache(
+            path, ttl=settings.get("ttl", 86400.0), max_entries=settings.get("max_entries", 1024)
+        )
+
+    def chat(
+        self,
+        connection: Any,
+        model: str,
+        messages: list[Message],
+        tools: list[Tool] = [],
+        system_prompt: str = "",
+        remove_thoughts: bool = True,
+        stream: bool = True,
+    ) -> LLMResponse:
+        """Drop-in for `ModelConnector.chat`, which answers from the cache if possible."""
+        key = request_key(model, messages, tools, system_prompt, remove_thoughts)
+        entry = self.get(key)
+        if entry is not None:
+            logger.debug(f"Completion cache hit for `{model}`")
+            return CachedResponse(entry, tools)
+        response = connection.chat(
+            model=model,
+            messages=messages,
+            tools=tools,
+            system_prompt=system_prompt,
+            remove_thoughts=remove_thoughts,
+            stream=stream,
+        )
+        return _RecordingResponse(response, lambda entry: self.put(key, entry))
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None or time.time() - entry["time"] > self._ttl:
+            return None
+        return entry["value"]
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        entry = {"time": time.time(), "value": value}
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    def _remember(self, key: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _read(self, key: str) -> dict[str, Any] | None:
+        if self._path is None:
+            return None
+        path = os.path.join(self._path, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.loads(f.read())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable completion cache entry `{path}`: {e}")
+            return None
+
+    def _write(self, key: str, entry: dict[str, Any]) -> None:
+        if self._path is None:
+            return
+        try:
+            os.makedirs(self._path, exist_ok=True)
+            path = os.path.join(self._path, f"{key}.json")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(entry))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write completion cache entry: {e}")
+
+
+class CachedResponse(LLMResponse):
+    """Replays a cached response token by token."""
+
+    def __init__(self, entry: dict[str, Any], tools: list[Tool]):
+        super().__init__()
+        self._entry = entry
+        self._tools = tools
+
+    @property
+    def stream(self) -> Generator[str, None, None]:
+        for token in self._entry["tokens"]:
+            yield token
+        self._raw_text = self._entry["text"]
+        self._tool_calls = _restore_tool_calls(self._entry["tool_calls"], self._tools)
+
+
+class _RecordingResponse(LLMResponse):
+    """Passes a response through and stores it once it was fully streamed."""
+
+    def __init__(self, response: LLMResponse, store):
+        super().__init__()
+        self._response = response
+        self._store = store
+
+    @property
+    def stream(self) -> Generator[str, None, None]:
+        tokens: list[str] = []
+        for token in self._response.stream:
+            tokens.append(token)
+            yield token
+        self._raw_text = self._response._raw_text
+        self._tool_calls = self._response.tool_calls
+        self._store({
+            "tokens": tokens,
+            "text": self._raw_text,
+            "tool_calls": [_dump_tool_call(tool_call) for tool_call in self._tool_calls],
+        })
+
+    def close(self) -> None:
+        self._response.close()
+
+    @property
+    def tool_calls(self) -> list[str | ToolCall]:
+        return self._response.tool_calls
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+
+def request_key(
+    model: str,
+    messages: list[Message],
+    tools: list[Tool],
+    system_prompt: str,
+    remove_thoughts: bool,
+) -> str:
+    """Canonical hash of everything that influences the response of an LLM."""
+    payload = {
+        "model": model,
+        "messages": [_dump_message(message) for message in messages],
+        "tools": [[tool.name, tool.description, tool.parameters] for tool in tools],
+        "system_prompt": system_prompt,
+        "remove_thoughts": remove_thoughts,
+    }
+    data = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _dump_message(message: Message) -> list[Any]:
+    content: Any = message.content
+    if message.blob is not None:
+        content = {"blob": message.blob}  # The reference is a hash of the content
+    elif not isinstance(content, str):
+        # Same layout as the former pydantic dump, so existing cache entries and recordings stay valid
+        content = [
+            {
+                "type": part.type,
+                "text": part.text,
+                "image_url": {"url": part.image_url} if part.image_url is not None else None,
+            }
+            for part in content
+        ]
+    tool_calls = None
+    if message.tool_calls is not None:
+        tool_calls = [_dump_tool_call(tool_call) for tool_call in message.tool_calls]
+    return [message.role, content, tool_calls, message.tool_call_id]
+
+
+def _dump_tool_call(tool_call: Any) -> Any:
+    if isinstance(tool_call, ToolCall):
+        return {"id": tool_call.id, "name": tool_call.tool.name, "params": tool_call.params}
+    return tool_call
+
+
+def _restore_tool_calls(tool_calls: list[Any], tools: list[Tool]) -> list[str | ToolCall]:
+    by_name = {tool.name: tool for tool in tools}
+    out: list[str | ToolCall] = []
+    for tool_call in tool_calls:
+        if isinstance(tool_call, dict) and tool_call["name"] in by_name:
+            out.append(ToolCall(id=tool_call["id"], tool=by_name[tool_call["name"]], params=tool_call["params"]))
+        elif isinstance(tool_call, dict):
+            out.append(f"Tool '{tool_call['name']}' not found.")
+        else:
+            out.append(str(tool_call))
+    return out
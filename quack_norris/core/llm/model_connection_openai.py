@@ -5,11 +5,13 @@ from openai import AzureOpenAI as _AzureAPI
 from openai import OpenAI as _OpenAIAPI
 from openai._types import NOT_GIVEN
 
-from quack_norris.core.llm.types import Tool, ChatMessage, LLMResponse
+from quack_norris.core.llm.types import Tool, Message, LLMResponse
 from quack_norris.core.llm.model_provider import ModelConnector, register_model_connector
 from quack_norris.core.llm.utils import tools_to_openai, tools_to_custom_prompt, messages_to_openai
 from quack_norris.core.llm.response_custom import CustomToolCallingResponse, CustomToolCallingResponseStream
 from quack_norris.core.llm.response_openai import OpenAIToolCallingResponse, OpenAIToolCallingResponseStream
+from quack_norris.core.llm.replay import ReplayRecorder
+from quack_norris.core.llm.completion_cache import request_key
 
 
 @register_model_connector("OpenAI", "AzureOpenAI", "ollama")
@@ -25,17 +27,16 @@ class OpenAIModelConnection(ModelConnector):
         with open(prompt_path, "r") as f:
             self.custom_tool_calling_prompt = f.read()
 
+        # Record the responses to a file, which can be replayed by the `replay` connector
+        self._recorder = None
+        if config.get("record_to", None) is not None:
+            self._recorder = ReplayRecorder(config["record_to"])
+
+        self._api_endpoint = api_endpoint
+        self._provider = provider
+        self._model = model
         if provider == "ollama":
-            if model == "AUTODETECT":
-                modelListEndpoint = api_endpoint + "/api/tags"
-                response = requests.get(modelListEndpoint)
-                response.raise_for_status()
-                data = response.json()
-                self._models = {
-                    config.get("name_prefix", "") + model["name"]: model["name"]
-                    for model in data["models"]
-                }
-            else:
+            if model != "AUTODETECT":
                 self._models = {config.get("name", model): model}
             self._client = _OpenAIAPI(base_url=api_endpoint + "/v1", api_key=api_key)
         elif provider == "AzureOpenAI" or provider == "OpenAI":
@@ -50,6 +51,40 @@ class OpenAIModelConnection(ModelConnector):
                 self._client = _OpenAIAPI(base_url=api_endpoint, api_key=api_key)
                 self._models = {config.get("name", model): model}
 
+    def discover_models(self) -> dict[str, str]:
+        if self._provider != "ollama" or self._model != "AUTODETECT":
+            return dict(self._models)
+        modelListEndpoint = self._api_endpoint + "/api/tags"
+        response = requests.get(modelListEndpoint, timeout=self._config.get("timeout", 5))
+        response.raise_for_status()
+        data = response.json()
+        return {
+            self._config.get("name_prefix", "") + model["name"]: model["name"]
+            for model in data["models"]
+        }
+
+    def set_models(self, models: dict[str, str]) -> None:
+        self._models = dict(models)
+
+    def warm_up(self, model: str, keep_alive: str | int, load: bool = True, pin: bool = True) -> bool:
+        if self._provider != "ollama":
+            return False
+        name = self._models[model]
+        response = requests.get(self._api_endpoint + "/api/ps", timeout=self._config.get("timeout", 5))
+        response.raise_for_status()
+        tagged = name if ":" in name else name + ":latest"
+        loaded = any(tagged in [m.get("name"), m.get("model")] for m in response.json().get("models", []))
+        if (loaded and not pin) or (not loaded and not load):
+            return False
+        # A request without prompt only loads the model and sets how long it stays loaded
+        response = requests.post(
+            self._api_endpoint + "/api/generate",
+            json={"model": name, "keep_alive": keep_alive},
+            timeout=self._config.get("load_timeout", 300),
+        )
+        response.raise_for_status()
+        return not loaded
+
     def embeddings(self, model: str, input: str | list[str]) -> list[list[float]]:
         response = self._client.embeddings.create(input=input, model=self._models[model])
         return [d.embedding for d in response.data]
@@ -57,7 +92,7 @@ class OpenAIModelConnection(ModelConnector):
     def chat(
         self,
         model: str,
-        messages: list[ChatMessage],
+        messages: list[Message],
         tools: list[Tool] = [],
         system_prompt: str = "",
         remove_thoughts: bool = True,
@@ -65,8 +100,10 @@ class OpenAIModelConnection(ModelConnector):
     ) -> LLMResponse:
         # Check if the model is in the list of models that require unofficial tool calling
         unofficial_toolcalling = model in self._config.get("unofficial_toolcalling", [])
+        key = ""
+        if self._recorder is not None:
+            key = request_key(model, messages, tools, system_prompt, remove_thoughts)
 
-        messages = messages_to_openai(messages, remove_thoughts)
         if len(tools) > 0 and unofficial_toolcalling:
             tool_prompt = tools_to_custom_prompt(tools, self.custom_tool_calling_prompt)
             system_prompt += "\n\n" + tool_prompt
@@ -75,31 +112,24 @@ class OpenAIModelConnection(ModelConnector):
         if self._config.get("no_think", False):
             system_prompt += " /no_think"
 
-        # depending on model putting the system prompt last improve performance
-        if self._config.get("system_prompt_last", False):
-            messages = messages + [ChatMessage(role="system", content=system_prompt)]
-        else:
-            messages = [ChatMessage(role="system", content=system_prompt)] + messages
-
         # disable streaming (response can fake stream)
         if self._config.get("never_stream", False):
             stream = False
 
-        # only pass text of messages (in case endpoint does not support images)
-        if self._config.get("text_only", False):
-            messages = [
-                ChatMessage(role=msg.role, content=msg.text()) for msg in messages
-            ]
-        if unofficial_toolcalling:
-            messages = [
-                ChatMessage(
-                    role="user",
-                    content="TOOL RESULT: " + msg.text(),
-                )
-                if msg.role == "tool"
-                else ChatMessage(role=msg.role, content=msg.content)
-                for msg in messages
-            ]
+        # text_only: in case the endpoint does not support images
+        openai_messages = messages_to_openai(
+            messages,
+            remove_thoughts,
+            text_only=self._config.get("text_only", False),
+            tool_results_as_user=unofficial_toolcalling,
+        )
+
+        # depending on model putting the system prompt last improve performance
+        system_message = {"role": "system", "content": system_prompt}
+        if self._config.get("system_prompt_last", False):
+            openai_messages = openai_messages + [system_message]
+        else:
+            openai_messages = [system_message] + openai_messages
 
         try:
             if unofficial_toolcalling or len(tools) == 0:
@@ -107,7 +137,7 @@ class OpenAIModelConnection(ModelConnector):
             else:
                 openai_tools = tools_to_openai(tools)
             response = self._client.chat.completions.create(
-                messages=messages,  # type: ignore
+                messages=openai_messages,  # type: ignore
                 model=self._models[model],
                 stream=stream,
                 max_tokens=self._config.get("max_tokens", NOT_GIVEN),
@@ -115,6 +145,11 @@ class OpenAIModelConnection(ModelConnector):
             )
         except openai.NotFoundError as e:
             raise RuntimeError(str(e))
+        if self._recorder is not None:
+            if stream:
+                response = self._recorder.record_stream(response, key, model, unofficial_toolcalling)
+            else:
+                self._recorder.record_completion(response, key, model, unofficial_toolcalling)
         if stream:    
             if unofficial_toolcalling:
                 return CustomToolCallingResponseStream(response, tools)
@@ -0,0 +1,113 @@
+from typing import Any
+import itertools
+import json
+import os
+import threading
+import uuid
+
+from quack_norris.core.llm.types import Tool, Message, LLMResponse
+from quack_norris.core.llm.model_provider import ModelConnector, register_model_connector
+from quack_norris.core.llm.completion_cache import request_key
+from quack_norris.core.llm.response_custom import CustomToolCallingResponse, CustomToolCallingResponseStream
+from quack_norris.core.llm.response_openai import OpenAIToolCallingResponse, OpenAIToolCallingResponseStream
+from quack_norris.core.llm.replay import ReplayStream, completion_from_chunks
+
+
+@register_model_connector("replay", "mock")
+class ReplayModelConnection(ModelConnector):
+    """
+    Replays recorded LLM streams without a backend, e.g. for benchmarks and offline tests.
+
+    The `api_endpoint` is a replay file written by an `OpenAIModelConnection` with
+    `record_to` in its config. A request is answered by the recording with the same
+    request, otherwise the recordings are replayed in order. The `mock` provider
+    generates a text of `tokens` tokens when there is no (matching) recording, or
+    first calls the `tool_call` (`{"name": ..., "arguments": {...}}`) `tool_rounds` times.
+    Config: `ttft` (seconds until the first token), `tokens_per_second` (0 is unlimited).
+    """
+
+    def __init__(self, api_endpoint: str, api_key: str, provider: str, model: str, config: dict={}):
+        self._config = config
+        self._provider = provider
+        self._model = model
+        self._models: dict[str, str] = {}
+        self._recordings: list[dict[str, Any]] = []
+        if api_endpoint != "" and os.path.exists(api_endpoint):
+            with open(api_endpoint, "r", encoding="utf-8") as f:
+                self._recordings = [json.loads(line) for line in f if line.strip() != ""]
+        elif provider == "replay":
+            raise FileNotFoundError(f"Replay file `{api_endpoint}` does not exist.")
+        self._by_key = {recording["key"]: recording for recording in self._recordings}
+        self._sequence = itertools.cycle(self._recordings) if len(self._recordings) > 0 else None
+        self._lock = threading.Lock()
+
+    def discover_models(self) -> dict[str, str]:
+        if self._model != "AUTODETECT":
+            return {self._config.get("name", self._model): self._model}
+        models = sorted(set(recording["model"] for recording in self._recordings))
+        return {self._config.get("name_prefix", "") + model: model for model in models}
+
+    def set_models(self, models: dict[str, str]) -> None:
+        self._models = dict(models)
+
+    def get_models(self) -> list[str]:
+        return list(self._models.keys())
+
+    def chat(
+        self,
+        model: str,
+        messages: list[Message],
+        tools: list[Tool] = [],
+        system_prompt: str = "",
+        remove_thoughts: bool = True,
+        stream: bool = True,
+    ) -> LLMResponse:
+        recording = self._by_key.get(request_key(model, messages, tools, system_prompt, remove_thoughts))
+        if recording is None and self._sequence is not None and self._config.get("sequential", True):
+            with self._lock:
+                recording = next(self._sequence)
+        if recording is None:
+            if self._provider != "mock":
+                raise RuntimeError(f"No recording for request to `{model}` found.")
+            recording = self._mock_recording(model, messages, tools)
+
+        custom = recording.get("custom_tool_calling", False)
+        if stream:
+            chunks = ReplayStream(
+                recording["chunks"], self._config.get("ttft", 0.0), self._config.get("tokens_per_second", 0.0)
+            )
+            if custom:
+                return CustomToolCallingResponseStream(chunks, tools)
+            return OpenAIToolCallingResponseStream(chunks, tools)
+        else:
+            response = completion_from_chunks(recording["chunks"])
+            if custom:
+                return CustomToolCallingResponse(response, tools)
+            return OpenAIToolCallingResponse(response, tools)
+
+    def _mock_recording(self, model: str, messages: list[Message], tools: list[Tool]) -> dict[str, Any]:
+        tool_call = self._config.get("tool_call", None)
+        if (
+            tool_call is not None
+            and any(tool.name == tool_call["name"] for tool in tools)
+            and _tool_rounds(messages) < self._config.get("tool_rounds", 1)
+        ):
+            arguments = json.dumps(tool_call.get("arguments", {}))
+            return {"model": model, "chunks": [{"content": "", "tool_calls": [
+                {"index": 0, "id": str(uuid.uuid4()), "name": tool_call["name"], "arguments": arguments}
+            ]}]}
+        words = self._config.get("text", "Quack! This is a mocked response of quack norris.").split(" ")
+        tokens = [words[i % len(words)] + " " for i in range(self._config.get("tokens", 64))]
+        return {"model": model, "chunks": [{"content": token} for token in tokens]}
+
+
+## Internals
+def _tool_rounds(messages: list[Message]) -> int:
+    """Number of tool results since the last user message."""
+    rounds = 0
+    for message in reversed(messages):
+        if message.role == "user":
+            break
+        if message.role == "tool":
+            rounds += 1
+    return rounds
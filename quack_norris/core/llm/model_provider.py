@@ -1,11 +1,15 @@
 import concurrent.futures
 import importlib
 import glob
+import itertools
 import os
+import threading
 from functools import partial
 
 from quack_norris.logging import logger
-from quack_norris.core.llm.types import LLM, Embedder, ModelConnectionSpec, ChatMessage, Tool, LLMResponse
+from quack_norris.core.llm.types import LLM, Embedder, ModelConnectionSpec, Message, Tool, LLMResponse
+from quack_norris.core.discovery_cache import DiscoveryCache
+from quack_norris.core.llm.completion_cache import CompletionCache
 from quack_norris.config import Config
 
 
@@ -24,10 +28,18 @@ class ModelConnector(object):
     def get_models(self) -> list[str]:
         raise NotImplementedError()
 
+    def discover_models(self) -> dict[str, str]:
+        """Ask the backend for its models, mapping the exposed name to the name on the backend."""
+        return {name: name for name in self.get_models()}
+
+    def set_models(self, models: dict[str, str]) -> None:
+        """Use a model mapping from a previous `discover_models` call (e.g. from the discovery cache)."""
+        pass
+
     def chat(
         self,
         model: str,
-        messages: list[ChatMessage],
+        messages: list[Message],
         tools: list[Tool] = [],
         system_prompt: str = "",
         remove_thoughts: bool = True,
@@ -38,74 +50,226 @@ class ModelConnector(object):
     def embeddings(self, model: str, input: str | list[str]) -> list[list[float]]:
         raise NotImplementedError()
 
+    def warm_up(self, model: str, keep_alive: str | int, load: bool = True, pin: bool = True) -> bool:
+        """
+        Keep the model loaded for `keep_alive`, returns whether it had to be loaded.
+
+        Without `load` a model that is not loaded is left alone (so it does not evict
+        others), without `pin` the keep alive of a model that is loaded is not renewed.
+        """
+        return False  # Backends without explicit loading have nothing to warm up
+
 
 class ModelProvider(object):
     _connections: dict[str, ModelConnector] = {}
     _models: dict[str, str] = {}
+    _connection_models: dict[str, dict[str, str]] = {}
+    _connection_order: list[str] = []
+    _ready = threading.Event()
+    _completion_cache: CompletionCache | None = None
+    _discovery_cache: DiscoveryCache | None = None
+    _specs: dict[str, ModelConnectionSpec] = {}
+    # Guards the maps above, connections are attached from connect threads while the config watcher updates them
+    _lock = threading.Lock()
+    # The latest connect of each connection, attaches of older (superseded) connects are dropped
+    _generations: dict[str, int] = {}
+    _generation_counter = itertools.count(1)
 
     @staticmethod
-    def initialize(config: Config) -> None:
+    def initialize(config: Config, wait: bool = True) -> None:
+        """
+        Connect to all configured LLMs in parallel.
+
+        With `wait=False` this returns immediately and each connection is attached
+        as soon as it is ready, so a server can start serving before all backends
+        answered. Use `wait_until_ready` to block until all connections finished.
+        """
         logger.info("Initializing LLMs")
-        llms = config.get("llms", None)
-        if llms is None:
-            llms = {
-                "Ollama": ModelConnectionSpec(
-                    api_endpoint="http://localhost:11434",
-                    api_key="ollama",
-                    provider="ollama",
-                    model="AUTODETECT",
-                    config={},
-                ),
-            }
+        llms = _llm_specs(config)
+        ModelProvider._completion_cache = CompletionCache.from_config(config)
 
+        # Attach models in the order of the config, in case the user intentionally
+        # overwrites some connections, we can map that
+        generation = next(ModelProvider._generation_counter)
+        with ModelProvider._lock:
+            ModelProvider._connection_order = list(llms.keys())
+            ModelProvider._specs = dict(llms)
+            ModelProvider._generations = {name: generation for name in llms}
+        ModelProvider._ready.clear()
+        cache = DiscoveryCache.from_config(config)
+        ModelProvider._discovery_cache = cache
+        thread = threading.Thread(target=ModelProvider._connect_all, args=(llms, cache, generation), daemon=True)
+        thread.start()
+        config.add_update_handler(
+            lambda changed: ModelProvider.update_connections(_llm_specs(config)) if "llms" in changed else None
+        )
+        if wait:
+            ModelProvider.wait_until_ready()
+
+    @staticmethod
+    def update_connections(llms: dict[str, ModelConnectionSpec]) -> None:
+        """
+        Apply a changed `llms` config without dropping the connections that did not change.
+
+        Removed connections are detached, new and changed ones connected in the background.
+        A changed connection keeps serving with its previous settings until it is replaced.
+        """
+        generation = next(ModelProvider._generation_counter)
+        with ModelProvider._lock:
+            previous = ModelProvider._specs
+            ModelProvider._specs = dict(llms)
+            ModelProvider._connection_order = list(llms.keys())
+            removed = [name for name in previous if name not in llms]
+            connect = {name: spec for name, spec in llms.items() if previous.get(name) != spec}
+            for name in removed:
+                ModelProvider._generations.pop(name, None)
+            for name in connect:
+                ModelProvider._generations[name] = generation
+            ModelProvider._rebuild_models()  # Before dropping the connections, so no model points to them
+            for name in removed:
+                ModelProvider._connections.pop(name, None)
+                ModelProvider._connection_models.pop(name, None)
+        for name in removed:
+            logger.info(f"LLM connection removed: {name}")
+        if len(connect) > 0:
+            logger.info(f"Connecting new or changed LLM connections: {', '.join(connect.keys())}")
+            threading.Thread(
+                target=ModelProvider._connect_all,
+                args=(connect, ModelProvider._discovery_cache, generation),
+                daemon=True,
+            ).start()
+
+    @staticmethod
+    def wait_until_ready(timeout: float | None = None) -> bool:
+        """Block until all connections are attached (or failed), returns False on timeout."""
+        return ModelProvider._ready.wait(timeout)
+
+    @staticmethod
+    def _connect_all(llms: dict[str, ModelConnectionSpec], cache: DiscoveryCache | None, generation: int) -> None:
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(ModelProvider._add_connection, config=conn, connection_name=name)
+            futures = {
+                executor.submit(ModelProvider._add_connection, config=conn, connection_name=name, cache=cache): name
                 for name, conn in llms.items()
-            ]
-            # Store the models temporarily so we can add them in the order of the config
-            # in case the user intentionally overwrites some connections, we can map that
-            results = {}
+            }
             for future in concurrent.futures.as_completed(futures):
-                name, connection, models = future.result()  # Raise exceptions if any
-                ModelProvider._connections[name] = connection
-                results[name] = models
-            for name in llms:
-                ModelProvider._models.update(**results[name])
+                try:
+                    name, connection, models, from_cache = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to connect LLM `{futures[future]}`: {e}")
+                    continue
+                ModelProvider._attach_connection(name, connection, models, generation)
+                if from_cache and cache is not None:
+                    # Came up from the cache, check in the background if the backend changed
+                    threading.Thread(
+                        target=ModelProvider._revalidate_connection,
+                        args=(name, connection, llms[name], cache, generation),
+                        daemon=True,
+                    ).start()
+        ModelProvider._ready.set()
         logger.info(f"{len(ModelProvider._models.keys())} LLMs initialized (via {len(ModelProvider._connections.keys())} connections)")
 
     @staticmethod
-    def _add_connection(config: ModelConnectionSpec, connection_name: str) -> tuple[str, ModelConnector, dict[str, str]]:
+    def _revalidate_connection(
+        name: str, connection: ModelConnector, config: ModelConnectionSpec, cache: DiscoveryCache, generation: int
+    ) -> None:
+        try:
+            discovered = connection.discover_models()
+        except Exception as e:
+            logger.warning(f"Failed to revalidate LLM `{name}`, keeping cached models: {e}")
+            return
+        cached = cache.get("llm", config)
+        cache.put("llm", config, discovered)
+        if discovered != cached:
+            logger.info(f"Models of LLM connection `{name}` changed, updating")
+            connection.set_models(discovered)
+            models = {k: name for k in connection.get_models()}
+            ModelProvider._attach_connection(name, connection, models, generation)
+
+    @staticmethod
+    def _attach_connection(name: str, connection: ModelConnector, models: dict[str, str], generation: int) -> None:
+        with ModelProvider._lock:
+            if ModelProvider._generations.get(name) != generation:
+                return  # Removed or changed in the config while connecting
+            ModelProvider._connections[name] = connection
+            ModelProvider._connection_models[name] = models
+            ModelProvider._rebuild_models()
+        logger.info(f"LLM connection ready: {name} ({len(models)} models)")
+
+    @staticmethod
+    def _rebuild_models() -> None:
+        # Call with the lock held. Build the new mapping first and swap it, so readers never see a partial update
+        all_models: dict[str, str] = {}
+        for connection_name in ModelProvider._connection_order:
+            all_models.update(**ModelProvider._connection_models.get(connection_name, {}))
+        ModelProvider._models = all_models
+
+    @staticmethod
+    def _add_connection(
+        config: ModelConnectionSpec, connection_name: str, cache: DiscoveryCache | None = None
+    ) -> tuple[str, ModelConnector, dict[str, str], bool]:
         models: dict[str, str] = {}
         logger.info(f"Connecting LLM: {connection_name}")
         provider = config["provider"]
         if provider in _MODEL_CONNECTION_REGISTRY:
             connection_cls = _MODEL_CONNECTION_REGISTRY[provider]
             connection = connection_cls(**config)
+            discovered = cache.get("llm", config) if cache is not None else None
+            from_cache = discovered is not None
+            if discovered is None:
+                discovered = connection.discover_models()
+                if cache is not None:
+                    cache.put("llm", config, discovered)
+            connection.set_models(discovered)
             models = {k: connection_name for k in connection.get_models()}
         else:
             raise NotImplementedError(f"No ModelConnector registered for provider '{provider}', known connectors for {list(_MODEL_CONNECTION_REGISTRY.keys())}.")
-        return connection_name, connection, models
+        return connection_name, connection, models, from_cache
 
     @staticmethod
     def get_models() -> list[str]:
         return list(ModelProvider._models.keys())
     
     @staticmethod
-    def get_llm(model: str) -> LLM:
-        if model not in ModelProvider._models:
+    def _get_connection(model: str) -> ModelConnector:
+        # Read each mapping once, they may be swapped by a config reload meanwhile
+        connection = ModelProvider._connections.get(ModelProvider._models.get(model, ""), None)
+        if connection is None:
             raise RuntimeError(f"Invalid model name `{model}`, no such model available.")
-        connection = ModelProvider._connections[ModelProvider._models[model]]
+        return connection
+
+    @staticmethod
+    def get_llm(model: str) -> LLM:
+        connection = ModelProvider._get_connection(model)
+        if ModelProvider._completion_cache is not None:
+            return partial(ModelProvider._completion_cache.chat, connection, model=model)
         return partial(connection.chat, model=model)
 
+    @staticmethod
+    def warm_up(model: str, keep_alive: str | int, load: bool = True, pin: bool = True) -> bool:
+        """Load a model on its backend (see `ModelConnector.warm_up`)."""
+        return ModelProvider._get_connection(model).warm_up(model, keep_alive, load=load, pin=pin)
+
     @staticmethod
     def get_embedder(model: str) -> Embedder:
-        if model not in ModelProvider._models:
-            raise RuntimeError(f"Invalid model name `{model}`, no such model available.")
-        connection = ModelProvider._connections[ModelProvider._models[model]]
+        connection = ModelProvider._get_connection(model)
         return partial(connection.embeddings, model=model)
 
 
+def _llm_specs(config: Config) -> dict[str, ModelConnectionSpec]:
+    llms = config.get("llms", None)
+    if llms is None:
+        llms = {
+            "Ollama": ModelConnectionSpec(
+                api_endpoint="http://localhost:11434",
+                api_key="ollama",
+                provider="ollama",
+                model="AUTODETECT",
+                config={},
+            ),
+        }
+    return llms
+
+
 # Dynamically import all model connection implementations
 current_dir = os.path.dirname(__file__)
 for path in glob.glob(os.path.join(current_dir, "model_connection_*.py")):
@@ -2,9 +2,12 @@ import traceback
 
 from quack_norris.logging import logger
 from quack_norris.api.chat_handler import ChatHandler, ChatHandlerProvider, ChatHandlerRegistry
-from quack_norris.core.llm.types import ChatMessage
+from quack_norris.core.llm.types import ChatMessage, to_messages
 from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.llm.utils import iterate_in_thread
 from quack_norris.core.output_writer import OutputWriter
+from quack_norris.core.metrics import StreamTimer
+from quack_norris.core.tracing import span
 from quack_norris.config import Config
 
 
@@ -18,25 +21,39 @@ class ProxyChatHandlerProvider(ChatHandlerProvider):
             logger.warning(
                 "No proxy configuration found in config, no models will be proxied."
             )
-            return
-        proxies: list[str] = [f"proxy.{k}" for k in ModelProvider.get_models() if k in config["proxy"]]
-        handler = ProxyChatHandlerProvider(proxies)
+        # Resolved lazily against the available models, as connections may attach later
+        handler = ProxyChatHandlerProvider(_proxies(config))
         ChatHandlerRegistry.register_handler_provider(handler)
 
+        def _on_config_update(changed: set[str]) -> None:
+            if "proxy" in changed:
+                handler._proxies = _proxies(config)  # Swapped, running chats already have their handler
+                logger.info(f"Proxied models updated: {', '.join(handler._proxies)}")
+
+        config.add_update_handler(_on_config_update)
+
     def get_handler(self, name: str) -> ChatHandler:
-        if name not in self._proxies:
+        if name not in self.list_handlers():
             raise RuntimeError(f"Model/Agent '{name}' not found in proxy provider.")
         model_name = name.replace("proxy.", "")
         async def _chat_handler(
             history: list[ChatMessage], workspace: str, output: OutputWriter
         ) -> None:
             try:
-                llm = ModelProvider.get_llm(model_name)
-                response = llm(messages=history, stream=True)
-                for token in response.stream:
-                    await output.write(token, separate=False, clean=False)
+                with span("llm.chat", model=model_name, agent="proxy") as llm_span:
+                    timer = StreamTimer(model=model_name, agent="proxy")
+                    llm = ModelProvider.get_llm(model_name)
+                    response = llm(messages=to_messages(history), stream=True)
+                    try:
+                        async for token in iterate_in_thread(response.stream):
+                            timer.token()
+                            await output.write(token, separate=False, clean=False)
+                    finally:
+                        response.close()
+                    timer.finish()
+                    llm_span.set(time_to_first_token=timer.time_to_first_token or 0.0, tokens=timer.tokens)
                 return
-            except:
+            except Exception:
                 logger.warning(
                     "WARNING: Failed to use streaming api, trying non streaming."
                 )
@@ -50,4 +67,9 @@ class ProxyChatHandlerProvider(ChatHandlerProvider):
 
 
     def list_handlers(self) -> list[str]:
-        return self._proxies
+        models = ModelProvider.get_models()
+        return [proxy for proxy in self._proxies if proxy.replace("proxy.", "") in models]
+
+
+def _proxies(config: Config) -> list[str]:
+    return [f"proxy.{k}" for k in config.get("proxy", [])]
@@ -0,0 +1,152 @@
+"""
+Recording and replaying of LLM responses.
+
+Replay files store one response per line as json: the request `key`, the `model`,
+whether it used `custom_tool_calling` and the `chunks` of the stream (content and tool call deltas).
+"""
+from types import SimpleNamespace
+from typing import Any, Iterator
+import json
+import os
+import threading
+import time
+
+from quack_norris.logging import logger
+
+
+## API
+class ReplayRecorder:
+    """Appends the chunks of LLM responses to a replay file for the `replay` connector."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        logger.info(f"Recording LLM responses to `{path}`")
+
+    def record_stream(self, stream, key: str, model: str, custom_tool_calling: bool) -> "_RecordingStream":
+        return _RecordingStream(
+            stream, lambda chunks: self._write(key, model, custom_tool_calling, chunks)
+        )
+
+    def record_completion(self, response, key: str, model: str, custom_tool_calling: bool) -> None:
+        if isinstance(response, list):
+            response = response[0]
+        message = response.choices[0].message
+        tool_calls = [
+            {"index": idx, "id": tool_call.id, "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+            for idx, tool_call in enumerate(getattr(message, "tool_calls", None) or [])
+        ]
+        self._write(key, model, custom_tool_calling, [{"content": message.content or "", "tool_calls": tool_calls}])
+
+    def _write(self, key: str, model: str, custom_tool_calling: bool, chunks: list[dict[str, Any]]) -> None:
+        line = json.dumps({"key": key, "model": model, "custom_tool_calling": custom_tool_calling, "chunks": chunks})
+        try:
+            with self._lock, open(self._path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            logger.warning(f"Failed to record LLM response: {e}")
+
+
+class ReplayStream:
+    """Iterates over recorded chunks shaped like the chunks of an openai stream."""
+
+    def __init__(self, chunks: list[dict[str, Any]], ttft: float, tokens_per_second: float):
+        self._chunks = chunks
+        self._ttft = ttft
+        self._delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self._closed = False
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        if self._ttft > 0:
+            time.sleep(self._ttft)
+        for idx, chunk in enumerate(self._chunks):
+            if self._closed:
+                return
+            if idx > 0 and self._delay > 0:
+                time.sleep(self._delay)
+            yield chunk_from_dict(chunk)
+
+    def close(self) -> None:
+        self._closed = True
+
+
+def chunk_from_dict(chunk: dict[str, Any]) -> SimpleNamespace:
+    tool_calls = [
+        SimpleNamespace(
+            index=tool_call["index"],
+            id=tool_call["id"],
+            function=SimpleNamespace(name=tool_call["name"], arguments=tool_call["arguments"]),
+        )
+        for tool_call in chunk.get("tool_calls", [])
+    ]
+    delta = SimpleNamespace(content=chunk.get("content", ""), tool_calls=tool_calls or None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+def completion_from_chunks(chunks: list[dict[str, Any]]) -> SimpleNamespace:
+    """Merge recorded chunks into the shape of a non streaming openai response."""
+    tool_calls: dict[int, dict[str, str]] = {}
+    for chunk in chunks:
+        for tool_call in chunk.get("tool_calls", []):
+            merged = tool_calls.setdefault(tool_call["index"], {"id": "", "name": "", "arguments": ""})
+            if tool_call["id"] is not None:
+                merged["id"] = tool_call["id"]
+            if tool_call["name"] is not None:
+                merged["name"] = tool_call["name"]
+            if tool_call["arguments"] is not None:
+                merged["arguments"] += tool_call["arguments"]
+    message = SimpleNamespace(
+        content="".join(chunk.get("content", "") for chunk in chunks),
+        tool_calls=[
+            SimpleNamespace(id=t["id"], function=SimpleNamespace(name=t["name"], arguments=t["arguments"]))
+            for t in tool_calls.values()
+        ] or None,
+    )
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+
+## Internals
+class _RecordingStream:
+    """
+    Passes an openai stream through and hands the recorded chunks to `store` once it ended.
+
+    Only streams that were read to the end are stored, a stream closed early (e.g. the
+    client disconnected) would otherwise be replayed as a truncated answer.
+    """
+
+    def __init__(self, stream, store):
+        self._stream = stream
+        self._store = store
+        self._chunks: list[dict[str, Any]] = []
+        self._stored = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if len(chunk.choices) > 0:
+                self._chunks.append(_chunk_to_dict(chunk))
+            yield chunk
+        if not self._stored:
+            self._stored = True
+            self._store(self._chunks)
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+        self._chunks = []  # Drop a partial recording
+
+
+def _chunk_to_dict(chunk) -> dict[str, Any]:
+    delta = chunk.choices[0].delta
+    out: dict[str, Any] = {"content": delta.content or ""}
+    if delta.tool_calls:
+        out["tool_calls"] = [
+            {
+                "index": tool_call.index,
+                "id": tool_call.id,
+                "name": tool_call.function.name if tool_call.function is not None else None,
+                "arguments": tool_call.function.arguments if tool_call.function is not None else None,
+            }
+            for tool_call in delta.tool_calls
+        ]
+    return out
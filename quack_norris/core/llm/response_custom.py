@@ -1,5 +1,6 @@
 from typing import Generator
 import json
+import re
 import uuid
 
 from quack_norris.core.llm.types import Tool, LLMResponse, ToolCall
@@ -27,65 +28,103 @@ class CustomToolCallingResponseStream(LLMResponse):
         self._stream = stream
         self._tools = tools
 
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
     @property
     def stream(self) -> Generator[str, None, None]:
         is_tool_call = False
         is_thinking = False
-        tool_calls: str = ""
+        tool_calls: list[str] = []
         buffer: str = ""
-        self._raw_text = ""
+        raw_text: list[str] = []
         try:
             for chunk in self._stream:
                 if len(chunk.choices) == 0:
                     continue
                 token = chunk.choices[0].delta.content or ""
-                self._raw_text += token  # Collect full text
-                token_buffer: str = ""
-                for char in token:
+                raw_text.append(token)  # Collect full text
+                # Fast path: plain text outside of any tag
+                if (
+                    not is_tool_call
+                    and buffer == ""
+                    and "<" not in token
+                    and (is_thinking or "[" not in token)
+                ):
+                    if token != "":
+                        yield token
+                    continue
+                # Scan the token for the next special character instead of char by char,
+                # text outside of tags is collected and yielded at the end of the token
+                token_buffer: list[str] = []
+                pos = 0
+                while pos < len(token):
                     if is_tool_call:
-                        tool_calls += char
-                        # End tool call on double newline
-                        if char == "\n" and tool_calls[-1] == "\n":
-                            is_tool_call = False
-                            self._stream.close()
+                        # End tool call on newline
+                        end = token.find("\n", pos)
+                        if end < 0:
+                            tool_calls.append(token[pos:])
                             break
-                    elif char == "<":
+                        tool_calls.append(token[pos:end + 1])
+                        is_tool_call = False
+                        self._stream.close()
+                        break
+                    if buffer != "":
+                        pattern = _WORD_END_THINKING if is_thinking else _WORD_END
+                    else:
+                        pattern = _WORD_START_THINKING if is_thinking else _WORD_START
+                    match = pattern.search(token, pos)
+                    if match is None:
                         if buffer != "":
-                            yield buffer
+                            buffer += token[pos:]
+                        else:
+                            token_buffer.append(token[pos:])
+                        break
+                    idx = match.start()
+                    char = token[idx]
+                    if buffer == "":
+                        token_buffer.append(token[pos:idx])
                         buffer = char
-                    elif char == "[" and not is_thinking:
-                        if buffer != "":
-                            yield buffer
+                    elif char in "<[":
+                        yield buffer + token[pos:idx]
                         buffer = char
-                    elif buffer != "":
-                        if char in [">", "]", " ", "\n", "\t"]:
-                            word: str = buffer + char
-                            buffer = ""
-                            if word == "<think>":
-                                is_thinking = True
-                            if word == "</think>":
-                                is_thinking = False
-                            if (
-                                not is_thinking
-                                and word == "[CALL]"
-                                and len(self._tools) > 0
-                            ):
-                                is_tool_call = True
-                                word = ""
-                            if word != "":
-                                yield word
-                        else:
-                            buffer += char
                     else:
-                        token_buffer += char
-                if token_buffer != "":
-                    yield token_buffer
+                        word: str = buffer + token[pos:idx] + char
+                        buffer = ""
+                        if word == "<think>":
+                            is_thinking = True
+                        if word == "</think>":
+                            is_thinking = False
+                        if (
+                            not is_thinking
+                            and word == "[CALL]"
+                            and len(self._tools) > 0
+                        ):
+                            is_tool_call = True
+                            word = ""
+                        if word != "":
+                            yield word
+                    pos = idx + 1
+                text = "".join(token_buffer)
+                if text != "":
+                    yield text
             if buffer != "":
                 yield buffer
         except Exception as e:
             yield f"\n\n[Error during streaming response: {e}]\n\n"
+        finally:
+            self._raw_text = "".join(raw_text)
+
+        self._tool_calls = _parse_tool_calls("".join(tool_calls).strip(), self._tools)
+
 
-        self._tool_calls = _parse_tool_calls(tool_calls.strip(), self._tools)
+# Characters starting a tag (`<think>`, `[CALL]`, ...) and ending or restarting one.
+# While thinking, `[` is plain text.
+_WORD_START = re.compile(r"[<\[]")
+_WORD_START_THINKING = re.compile(r"<")
+_WORD_END = re.compile(r"[<\[> \]\n\t]")
+_WORD_END_THINKING = re.compile(r"[<> \]\n\t]")
 
 
 def _parse_tool_calls(tool_calls: str, tools: list[Tool]) -> list[str | ToolCall]:
@@ -29,31 +29,40 @@ class OpenAIToolCallingResponseStream(LLMResponse):
         self._stream = stream
         self._tools = tools
 
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
     @property
     def stream(self) -> Generator[str, None, None]:
         native_tool_calls = {}
-        self._raw_text = ""
-        for chunk in self._stream:
-            if len(chunk.choices) == 0:
-                continue
-            for tool_call in chunk.choices[0].delta.tool_calls or []:
-                if tool_call.index not in native_tool_calls:
-                    native_tool_calls[tool_call.index] = {
-                        "id": "",
-                        "name": "",
-                        "arguments": ""
-                    }
-                if tool_call.id is not None:
-                    native_tool_calls[tool_call.index]["id"] = tool_call.id
-                if tool_call.function.name is not None:
-                    native_tool_calls[tool_call.index]["name"] = tool_call.function.name
-                if tool_call.function.arguments is not None:
-                    native_tool_calls[tool_call.index]["arguments"] += tool_call.function.arguments
-            token = chunk.choices[0].delta.content or ""
-            if token != "":
-                self._raw_text += token
-                yield token
+        raw_text: list[str] = []
+        try:
+            for chunk in self._stream:
+                if len(chunk.choices) == 0:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls or []:
+                    if tool_call.index not in native_tool_calls:
+                        native_tool_calls[tool_call.index] = {
+                            "id": "",
+                            "name": "",
+                            "arguments": []
+                        }
+                    if tool_call.id is not None:
+                        native_tool_calls[tool_call.index]["id"] = tool_call.id
+                    if tool_call.function.name is not None:
+                        native_tool_calls[tool_call.index]["name"] = tool_call.function.name
+                    if tool_call.function.arguments is not None:
+                        native_tool_calls[tool_call.index]["arguments"].append(tool_call.function.arguments)
+                token = chunk.choices[0].delta.content or ""
+                if token != "":
+                    raw_text.append(token)
+                    yield token
+        finally:
+            self._raw_text = "".join(raw_text)
 
+        for tool_call in native_tool_calls.values():
+            tool_call["arguments"] = "".join(tool_call["arguments"])
         self._tool_calls = _parse_openai_tool_calls(native_tool_calls, self._tools)
 
 
@@ -1,6 +1,15 @@
+from dataclasses import dataclass, replace
 from typing import Any, Callable, Generator, Optional, TypedDict, Protocol
+import sys
+
 from pydantic import BaseModel
 
+from quack_norris.logging import logger
+from quack_norris.core.blob_store import load_blob, store_blob
+
+
+_MISSING_BLOB = "[Content no longer available, it was removed from the blob store.]"
+
 
 class ImageURL(BaseModel):
     url: str
@@ -25,9 +34,10 @@ class Tool(BaseModel):
     tool_callable: Callable
 
 
-class ToolCall(BaseModel):
+@dataclass(slots=True)
+class ToolCall:
     id: str
-    tool: Tool
+    tool: Tool  # Shared with the tool list, not a copy
     params: dict[str, Any]
 
 
@@ -47,6 +57,92 @@ class ChatMessage(BaseModel):
         return ""
 
 
+@dataclass(slots=True)
+class MessagePart:
+    """Lightweight `ChatContent`, the `image_url` is just the url."""
+    type: str
+    text: Optional[str] = ""
+    image_url: Optional[str] = None
+
+
+@dataclass(slots=True)
+class Message:
+    """
+    Lightweight chat message, used by the agents and LLM connections.
+
+    Histories are kept as `Message`s (no validation, no per-instance dict), the
+    pydantic `ChatMessage` is only used at the api boundaries (see `to_messages`).
+    Large tool outputs of the agents are kept in the blob store and only referenced.
+    """
+    role: str
+    content: str | list[MessagePart]
+    tool_calls: Optional[list[str | ToolCall | Any]] = None
+    tool_call_id: Optional[str] = None
+    blob: Optional[str] = None  # Set instead of a large text `content`, see `text`
+
+    def text(self, resolve: bool = True) -> str:
+        """The text, with `resolve=False` texts in the blob store are skipped (e.g. to scan a history)."""
+        if self.blob is not None:
+            return (_load_blob(self.blob) or _MISSING_BLOB) if resolve else ""
+        if isinstance(self.content, str):
+            return self.content
+        for part in self.content:
+            if part.type == "text" and part.text is not None:
+                return part.text
+        return ""
+
+    def has_blobs(self) -> bool:
+        return self.blob is not None
+
+    def resolved(self) -> "Message":
+        """The message with the blob loaded, e.g. to build the payload for an LLM."""
+        if self.blob is None:
+            return self
+        return replace(self, content=self.text(), blob=None)
+
+    @staticmethod
+    def from_text(role: str, text: str, **kwargs: Any) -> "Message":
+        """
+        Message with a text content, which is moved to the blob store if it is large.
+
+        Storing hashes and writes the text, do not call this on the event loop.
+        """
+        blob = store_blob(text)
+        return Message(role=role, content=text if blob is None else "", blob=blob, **kwargs)
+
+    @staticmethod
+    def from_chat(message: ChatMessage) -> "Message":
+        # Kept inline, the history of a request is only converted and sent for this request
+        if isinstance(message.content, str):
+            content: str | list[MessagePart] = message.content
+        else:
+            content = [_part_from_chat(part) for part in message.content]
+        return Message(
+            role=sys.intern(message.role),
+            content=content,
+            tool_calls=message.tool_calls,
+            tool_call_id=message.tool_call_id,
+        )
+
+
+def to_messages(history: list[ChatMessage] | list[Message]) -> list[Message]:
+    """Convert a history from the api to `Message`s (messages that already are, are kept)."""
+    return [message if isinstance(message, Message) else Message.from_chat(message) for message in history]
+
+
+def _part_from_chat(part: ChatContent) -> MessagePart:
+    url = part.image_url.url if part.image_url is not None else None
+    return MessagePart(type=part.type, text=part.text, image_url=url)
+
+
+def _load_blob(ref: str) -> Optional[str]:
+    try:
+        return load_blob(ref)
+    except KeyError as e:
+        logger.warning(f"Replacing missing blob with a placeholder: {e}")
+        return None
+
+
 class LLMResponse(object):
     def __init__(self, raw_text: Optional[str] = None, tool_calls: Optional[list[str | ToolCall]] = None):
         """
@@ -69,6 +165,10 @@ class LLMResponse(object):
         if self._tool_calls is None:
             self._tool_calls = []
 
+    def close(self) -> None:
+        """Stop the generation on the backend, e.g. when the client is gone."""
+        pass
+
     @property
     def tool_calls(self) -> list[str | ToolCall]:
         if self._tool_calls is None:
@@ -89,7 +189,7 @@ class LLMResponse(object):
 class LLM(Protocol):
     def __call__(
         self,
-        messages: list[ChatMessage],
+        messages: list[Message],
         tools: list[Tool] = [],
         system_prompt: str = "",
         remove_thoughts: bool = True,
@@ -1,9 +1,15 @@
-from typing import Any
+from typing import Any, AsyncGenerator, Iterable, TypeVar
+from collections import OrderedDict, deque
+from dataclasses import replace
+import asyncio
 import json
 import re
-import uuid
+import threading
 
-from quack_norris.core.llm.types import ChatMessage, Tool, ToolCall
+from quack_norris.core.llm.types import Message, MessagePart, Tool, ToolCall
+
+
+T = TypeVar("T")
 
 
 def remove_thoughts_from_str(message: str) -> str:
@@ -11,16 +17,17 @@ def remove_thoughts_from_str(message: str) -> str:
     return re.sub(r"<think>.*?</think>", "", message, flags=re.DOTALL).strip()
 
 
-def remove_thoughts(message: ChatMessage) -> ChatMessage:
+def remove_thoughts(message: Message) -> Message:
     """Remove <think>...</think> tags from the message content."""
-    message = message.model_copy()
     if isinstance(message.content, str):
-        message.content = remove_thoughts_from_str(message.content)
-    if isinstance(message.content, list):
-        for content in message.content:
-            if content.type == "text" and content.text is not None:
-                content.text = remove_thoughts_from_str(content.text)
-    return message
+        return replace(message, content=remove_thoughts_from_str(message.content))
+    content = [
+        replace(part, text=remove_thoughts_from_str(part.text))
+        if part.type == "text" and part.text is not None
+        else part
+        for part in message.content
+    ]
+    return replace(message, content=content)
 
 
 def tools_to_openai(tools: list[Tool] = []) -> list[dict[str, Any]]:
@@ -64,28 +71,165 @@ def tools_to_custom_prompt(tools: list[Tool], tool_calling_prompt: str) -> str:
     return tool_calling_prompt.format(tools="\n".join(tool_descriptions))
 
 
-def messages_to_openai(messages: list[ChatMessage], is_remove_thoughts: bool) -> list[ChatMessage]:
+def messages_to_openai(
+    messages: list[Message],
+    is_remove_thoughts: bool,
+    text_only: bool = False,
+    tool_results_as_user: bool = False,
+) -> list[dict[str, Any]]:
     """
-    Convert the messages to adhere to the openai format.
+    Convert the messages to the dicts the openai api expects, in a single pass.
 
-    Specifically replace tool calls with the OpenAI format in the history.
+    Thoughts are removed, tool calls converted to the OpenAI format and, if requested,
+    only the text is kept (`text_only`) or tool results are sent as user messages
+    (`tool_results_as_user`, for unofficial tool calling). Every message is converted
+    once and then reused from a cache, as the same history is sent on every agent step.
+    Blobs (large tool outputs) are loaded here and not cached. The returned dicts are shared, do not modify them.
     """
+    flags = (is_remove_thoughts, text_only, tool_results_as_user)
+    result = []
+    for message in messages:
+        if message.has_blobs():
+            # Not cached, so large tool outputs are only loaded while sending
+            result.append(_message_to_openai(message.resolved(), *flags))
+            continue
+        key = (_message_key(message), flags)
+        with _converted_lock:
+            converted = _converted.get(key)
+            if converted is not None:
+                _converted.move_to_end(key)
+        if converted is None:
+            converted = _message_to_openai(message, *flags)
+            with _converted_lock:
+                _converted[key] = converted
+                if len(_converted) > _CONVERTED_MAX_ENTRIES:
+                    _converted.popitem(last=False)
+        result.append(converted)
+    return result
+
+
+async def iterate_in_thread(stream: Iterable[T]) -> AsyncGenerator[T, None]:
+    """
+    Iterate a blocking stream (e.g. the tokens of an `LLMResponse`) in a worker thread.
+
+    Waiting for the next token then does not block the event loop, so other chats
+    (e.g. concurrent requests or batch items) progress in the meantime.
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+    buffer: deque[tuple[bool, Any]] = deque()
+    waiter: list[asyncio.Future] = []  # Set while the consumer waits for items
+    stopped = threading.Event()
+
+    def _wake(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def _put(done: bool, item: Any) -> None:
+        # Only wake the event loop if the consumer waits, items produced meanwhile are handed over in one go
+        with lock:
+            buffer.append((done, item))
+            future = waiter.pop() if len(waiter) > 0 else None
+        if future is not None:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                stopped.set()  # The event loop is closed, nobody is listening anymore
+
+    def _produce() -> None:
+        try:
+            for item in stream:
+                if stopped.is_set():
+                    return
+                _put(False, item)
+        except BaseException as e:
+            _put(True, e)
+        else:
+            _put(True, None)
+
+    threading.Thread(target=_produce, daemon=True).start()
+    try:
+        while True:
+            with lock:
+                items = list(buffer)
+                buffer.clear()
+                future = loop.create_future() if len(items) == 0 else None
+                if future is not None:
+                    waiter.append(future)
+            if future is not None:
+                await future
+                continue
+            for done, item in items:
+                if done:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+    finally:
+        stopped.set()
+
+
+## Internals
+# Converted messages by content, shared by all conversations (and threads)
+_CONVERTED_MAX_ENTRIES = 4096
+_converted: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+_converted_lock = threading.Lock()
+
+
+def _message_key(message: Message) -> tuple:
+    # Hashes of strings are cached by python, so the key is cheap for messages seen before
+    if isinstance(message.content, str):
+        content: Any = message.content
+    else:
+        content = tuple((part.type, part.text, part.image_url) for part in message.content)
+    tool_calls = None
+    if message.tool_calls is not None:
+        # With the arguments, a backend may reuse tool call ids
+        tool_calls = tuple(
+            (tc.id, tc.tool.name, json.dumps(tc.params, sort_keys=True, default=str))
+            for tc in message.tool_calls
+            if isinstance(tc, ToolCall)
+        )
+    return (message.role, content, tool_calls, message.tool_call_id)
+
+
+def _message_to_openai(
+    message: Message, is_remove_thoughts: bool, text_only: bool, tool_results_as_user: bool
+) -> dict[str, Any]:
     if is_remove_thoughts:
-        messages = [remove_thoughts(message) for message in messages]
+        message = remove_thoughts(message)
+    if text_only:
+        content: Any = message.text()
+    elif isinstance(message.content, str):
+        content = message.content
+    else:
+        content = [_part_to_openai(part) for part in message.content]
+    if tool_results_as_user:
+        if message.role == "tool":
+            return {"role": "user", "content": "TOOL RESULT: " + message.text()}
+        return {"role": message.role, "content": content}
+    converted: dict[str, Any] = {"role": message.role, "content": content}
+    if text_only:
+        return converted
+    if message.tool_calls is not None:
+        converted["tool_calls"] = [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {"name": tc.tool.name, "arguments": json.dumps(tc.params)},
+            }
+            for tc in message.tool_calls
+            if isinstance(tc, ToolCall)
+        ]
+    if message.tool_call_id is not None:
+        converted["tool_call_id"] = message.tool_call_id
+    return converted
 
-    # Convert tool calls to openai format
-    for message in messages:
-        if message.tool_calls is not None:
-            message.tool_calls = [
-                {
-                    "id": tc.id if hasattr(tc, "id") else str(uuid.uuid4()),
-                    "type": "function",
-                    "function": {
-                        "name": tc.tool.name if hasattr(tc, "tool") else "",
-                        "arguments": json.dumps(tc.params) if hasattr(tc, "params") else "{}"
-                    }
-                }
-                for tc in message.tool_calls
-                if isinstance(tc, ToolCall)
-            ]
-    return messages
+
+def _part_to_openai(part: MessagePart) -> dict[str, Any]:
+    converted: dict[str, Any] = {"type": part.type}
+    if part.text is not None:
+        converted["text"] = part.text
+    if part.image_url is not None:
+        converted["image_url"] = {"url": part.image_url}
+    return converted
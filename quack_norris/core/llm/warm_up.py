@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from quack_norris.logging import logger
+from quack_norris.config import Config
+from quack_norris.core.llm.model_provider import ModelProvider
+from quack_norris.core.metrics import LLM_COLD_LOADS, LLM_LOAD_LATENCY
+
+
+_enabled = True
+_keep_alive: str | int = "30m"
+_keep_alive_models: dict[str, str | int] = {}
+_in_flight: set[str] = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warm_up")
+# Whether a warm up loads a model that is not loaded and renews the keep alive of a loaded one
+_ACTIONS = {
+    "startup": (True, True),
+    "request": (True, False),  # The chat is about to use the model anyway
+    "switch": (True, False),
+    "keep_alive": (False, True),  # Loading it again could evict the model of another chat
+}
+
+
+## API
+def setup_warm_up(config: Config) -> None:
+    """Configure loading models ahead of time from the `warm_up` section of the config."""
+    global _enabled, _keep_alive, _keep_alive_models
+    settings = config.get("warm_up", {})
+    _enabled = settings.get("enabled", True)
+    _keep_alive = settings.get("keep_alive", "30m")
+    _keep_alive_models = dict(settings.get("keep_alive_models", {}))
+
+
+def preload_models(config: Config) -> None:
+    """
+    Load the `preload` models (default: the default model) in the background.
+
+    They are loaded one after another once the LLMs are connected, loading them at
+    once would only make them evict each other on a backend with little memory.
+    """
+    models = config.get("warm_up", {}).get("preload", [config.get("default_model", "gemma3:12b")])
+    timeout = config.get("startup_timeout", 30.0)
+
+    def _preload():
+        ModelProvider.wait_until_ready(timeout)
+        for model in models:
+            warm_up(model, reason="startup", wait=True)
+
+    threading.Thread(target=_preload, daemon=True).start()
+
+
+def warm_up(model: str | None, reason: str, wait: bool = False) -> None:
+    """
+    Load a model (e.g. of the agent that answers next) and pin it for its `keep_alive`.
+
+    Chats with the OpenAI api of ollama reset the keep alive to the default of the
+    server, so this is also called after a chat to pin the model again (only if it is
+    still loaded).
+    Cold loads are counted by `reason` (`startup`, `request`, `switch`).
+    """
+    if not _enabled or model is None:
+        return
+    with _lock:
+        if model in _in_flight:
+            return  # Already loading
+        _in_flight.add(model)
+    if wait:
+        _warm_up(model, reason)
+    else:
+        _executor.submit(_warm_up, model, reason)
+
+
+## Internals
+def _warm_up(model: str, reason: str) -> None:
+    try:
+        start = time.perf_counter()
+        load, pin = _ACTIONS[reason]
+        if ModelProvider.warm_up(model, _keep_alive_models.get(model, _keep_alive), load=load, pin=pin):
+            duration = time.perf_counter() - start
+            LLM_COLD_LOADS.inc(model=model, reason=reason)
+            LLM_LOAD_LATENCY.observe(duration, model=model)
+            logger.info(f"Loaded model `{model}` in {duration:.1f}s ({reason})")
+    except Exception as e:
+        logger.warning(f"Failed to warm up model `{model}`: {e}")
+    finally:
+        with _lock:
+            _in_flight.discard(model)
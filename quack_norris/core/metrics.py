@@ -0,0 +1,173 @@
+from typing import Callable, Iterable
+import bisect
+import threading
+import time
+
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 200.0, 500.0)
+_metrics: list["_Metric"] = []
+
+
+## API
+def render_metrics() -> str:
+    """Render all metrics in the prometheus text exposition format."""
+    return "".join(metric.render() for metric in _metrics)
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self._metric = _Metric(name, description, "counter", tuple(labels))
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._metric.add(labels, amount)
+
+
+class Gauge:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self._metric = _Metric(name, description, "gauge", tuple(labels))
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._metric.add(labels, amount)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self._metric.add(labels, -amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the (unlabeled) value when the metrics are rendered."""
+        self._metric.function = function
+
+
+class Histogram:
+    def __init__(
+        self, name: str, description: str, labels: Iterable[str] = (),
+        buckets: tuple[float, ...] = _LATENCY_BUCKETS,
+    ):
+        self._metric = _Metric(name, description, "histogram", tuple(labels), buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        self._metric.observe(labels, value)
+
+
+class StreamTimer:
+    """Measures time to first token, inter token latency and throughput of a token stream."""
+
+    def __init__(self, model: str, agent: str):
+        self._labels = {"model": model, "agent": agent}
+        self.start = time.perf_counter()
+        self.first: float | None = None
+        self.last: float | None = None
+        self.tokens = 0
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+            LLM_TIME_TO_FIRST_TOKEN.observe(now - self.start, **self._labels)
+        elif self.last is not None:
+            LLM_INTER_TOKEN_LATENCY.observe(now - self.last, **self._labels)
+        self.last = now
+        self.tokens += 1
+
+    @property
+    def time_to_first_token(self) -> float | None:
+        return self.first - self.start if self.first is not None else None
+
+    def finish(self) -> None:
+        LLM_LATENCY.observe(time.perf_counter() - self.start, **self._labels)
+        if self.first is not None and self.last is not None and self.last > self.first:
+            LLM_TOKENS_PER_SECOND.observe((self.tokens - 1) / (self.last - self.first), **self._labels)
+
+
+## Internals
+class _Metric:
+    def __init__(
+        self, name: str, description: str, kind: str, labels: tuple[str, ...],
+        buckets: tuple[float, ...] = (),
+    ):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+        self.function: Callable[[], float] | None = None
+        self._values: dict[tuple[str, ...], float] = {}
+        self._histograms: dict[tuple[str, ...], list[float]] = {}  # bucket counts, sum, count
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def add(self, labels: dict[str, str], amount: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def observe(self, labels: dict[str, str], value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0.0] * (len(self.buckets) + 3)
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            if self.function is not None:
+                lines.append(f"{self.name} {self.function()}")
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+            for key, histogram in self._histograms.items():
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {histogram[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if len(names) == 0:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+## Metrics
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "quack_norris_llm_time_to_first_token_seconds", "Time until the LLM streamed the first token.", ("model", "agent")
+)
+LLM_INTER_TOKEN_LATENCY = Histogram(
+    "quack_norris_llm_inter_token_latency_seconds", "Time between two streamed tokens.", ("model", "agent")
+)
+LLM_LATENCY = Histogram(
+    "quack_norris_llm_latency_seconds", "Total duration of an LLM call.", ("model", "agent")
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "quack_norris_llm_tokens_per_second", "Streaming throughput of an LLM call.", ("model", "agent"),
+    buckets=_RATE_BUCKETS,
+)
+LLM_COLD_LOADS = Counter(
+    "quack_norris_llm_cold_loads_total", "Models the backend had to load before they could answer.", ("model", "reason")
+)
+LLM_LOAD_LATENCY = Histogram("quack_norris_llm_load_seconds", "Duration of loading a model on its backend.", ("model",))
+TOOL_CALLS = Counter("quack_norris_tool_calls_total", "Number of MCP tool calls.", ("tool",))
+TOOL_ERRORS = Counter("quack_norris_tool_errors_total", "Number of failed MCP tool calls.", ("tool",))
+TOOL_LATENCY = Histogram("quack_norris_tool_latency_seconds", "Duration of MCP tool calls.", ("tool",))
+TOOL_CACHE_HITS = Counter("quack_norris_tool_cache_hits_total", "MCP tool calls answered from the cache.", ("tool",))
+REQUESTS_IN_FLIGHT = Gauge("quack_norris_requests_in_flight", "Chat requests currently being answered.")
+GENERATIONS_IN_FLIGHT = Gauge(
+    "quack_norris_generations_in_flight", "Chat generations currently running (coalesced requests share one)."
+)
+REQUESTS_COALESCED = Counter(
+    "quack_norris_requests_coalesced_total", "Requests that joined an identical generation in flight."
+)
+STREAM_QUEUE_DEPTH = Gauge(
+    "quack_norris_stream_queue_depth", "Chunks generated but not yet sent to the slowest client, summed over all streams."
+)
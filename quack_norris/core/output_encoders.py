@@ -0,0 +1,96 @@
+from typing import Any
+from time import time
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional, only makes encoding faster
+    orjson = None
+
+
+# Which block of the markup each event type is written into
+_BLOCKS = {
+    "token": "default",
+    "thought": "thought",
+    "tool_call": "thought",
+    "tool_result": "thought",
+    "detail": "detail",
+}
+
+
+## API
+class MarkupEncoder:
+    """
+    Encodes the events of an `OutputWriter` as text with `<think>`/`<details>` markup.
+
+    This is the format OpenAI compatible clients (and the output files of the cli) get.
+    """
+
+    def __init__(self):
+        self._state = "default"
+        self._topic = "default"
+
+    def encode(self, event: dict[str, Any]) -> str:
+        state = _BLOCKS.get(event["type"], None)
+        if state is None:  # Events without text, e.g. `agent_switch`
+            return event.get("text", "")
+        topic = event.get("topic", state)
+        markup = ""
+        if state != self._state:
+            if self._state == "thought":
+                markup += "\n</think>\n"
+            elif self._state == "detail":
+                markup += "\n</details>\n"
+            if state == "thought":
+                markup += "\n<think>\n"
+            elif state == "detail":
+                markup += f"\n<details><summary><b>{topic}:</b></summary>\n\n"
+        elif state == "detail" and self._topic != topic:
+            markup += f"\n</details>\n\n<details><summary><b>{topic}:</b></summary>\n\n"
+        self._state = state
+        self._topic = topic
+        return markup + event["text"]
+
+
+class SSEEncoder:
+    """
+    Encodes events as server-sent `chat.completion.chunk` frames of the OpenAI api.
+
+    The content is the markup text. All parts of a frame except the index and the
+    content are serialized once per stream.
+    """
+
+    DONE = "data: [DONE]\n\n"
+
+    def __init__(self, model: str):
+        self._markup = MarkupEncoder()
+        self._index = 0
+        self._middle = (
+            f',"object":"chat.completion.chunk","created":{int(time())},"model":{dumps(model)},'
+            '"choices":[{"delta":{"content":'
+        )
+
+    def encode(self, event: dict[str, Any]) -> str:
+        return self.encode_text(self._markup.encode(event))
+
+    def encode_text(self, text: str) -> str:
+        """Frame for a text chunk, empty chunks are skipped."""
+        if text == "":
+            return ""
+        frame = f'data: {{"id":{self._index}{self._middle}{dumps(text)},"role":"assistant"}}}}]}}\n\n'
+        self._index += 1
+        return frame
+
+
+class RawEncoder:
+    """Encodes every event as one line of json, e.g. for tools reading the output of the cli."""
+
+    def encode(self, event: dict[str, Any]) -> str:
+        return dumps(event) + "\n"
+
+
+def dumps(value: Any) -> str:
+    """Serialize to json, with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value)
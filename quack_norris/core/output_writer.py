@@ -1,12 +1,115 @@
-from asyncio import Queue
+from typing import Any, Protocol, TextIO
+import shutil
+import tempfile
+
+from quack_norris.core.output_encoders import MarkupEncoder
+
+
+class OutputBuffer:
+    """
+    Accumulates text in linear time, as a list of chunks instead of repeated `+=`.
+
+    With `max_chars` only the first `max_chars` characters are kept (`truncated` is set).
+    With `spill_chars` the text is moved to a temporary file whenever more than that
+    is held in memory, so very long outputs (e.g. megabytes of tool results) do not.
+    """
+
+    def __init__(self, max_chars: int | None = None, spill_chars: int | None = None):
+        self._chunks: list[str] = []
+        self._in_memory = 0
+        self._length = 0
+        self._max_chars = max_chars
+        self._spill_chars = spill_chars
+        self._file: TextIO | None = None
+        self.truncated = False
+
+    def write(self, text: str) -> None:
+        if self._max_chars is not None and self._length + len(text) > self._max_chars:
+            text = text[:max(self._max_chars - self._length, 0)]
+            self.truncated = True
+        if text == "":
+            return
+        self._chunks.append(text)
+        self._in_memory += len(text)
+        self._length += len(text)
+        if self._spill_chars is not None and self._in_memory > self._spill_chars:
+            self._spill()
+
+    def getvalue(self) -> str:
+        text = "".join(self._chunks)
+        self._chunks = [text] if text != "" else []  # Join only once for repeated reads
+        if self._file is None:
+            return text
+        self._file.seek(0)
+        spilled = self._file.read()
+        self._file.seek(0, 2)
+        return spilled + text
+
+    def copy_to(self, f: TextIO) -> None:
+        """Write the text to a file, without loading spilled text into memory at once."""
+        if self._file is not None:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, f)
+            self._file.seek(0, 2)
+        for chunk in self._chunks:
+            f.write(chunk)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _spill(self) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self._file.write("".join(self._chunks))
+        self._chunks = []
+        self._in_memory = 0
+
+
+class EventSink(Protocol):
+    """Anything events or markup can be put into, e.g. an `asyncio.Queue` or a `Broadcaster`."""
+
+    async def put(self, item: Any) -> None: ...
 
 
 class OutputWriter:
-    def __init__(self, queue: Queue | None = None):
+    """
+    Emits the output of a chat as typed events.
+
+    Every write is one event with a `type` (`token`, `thought`, `detail`, `tool_call`,
+    `tool_result`, `agent_switch`) and its `text`. Events are put into `events`, the
+    markup text (see `MarkupEncoder`) into `queue` and the `buffer` (`False` disables
+    it, e.g. when the caller streams). Without a queue the output is printed, with the
+    `echo_encoder` if given (e.g. `RawEncoder`).
+    """
+
+    def __init__(
+        self,
+        queue: EventSink | None = None,
+        echo: bool = True,
+        events: EventSink | None = None,
+        echo_encoder=None,
+        buffer: OutputBuffer | bool = True,
+    ):
         self._state = "default"
         self._topic = "default"
         self._queue = queue
-        self.output_buffer = ""
+        self._echo = echo  # Print to the terminal, if there is no queue
+        self._echo_encoder = echo_encoder
+        self._events = events
+        self._markup = MarkupEncoder()
+        if buffer is True:
+            buffer = OutputBuffer()
+        self._buffer: OutputBuffer | None = buffer if buffer is not False else None
+
+    @property
+    def output_buffer(self) -> str:
+        """The markup text written so far (empty if buffering is disabled)."""
+        return self._buffer.getvalue() if self._buffer is not None else ""
 
     async def thought(self, text: str, separate=True) -> None:
         await self.write(text, message_type="thought", separate=separate)
@@ -17,51 +120,68 @@ class OutputWriter:
     async def detail(self, topic: str, text: str, separate=True) -> None:
         await self.write(text, message_type=topic, separate=separate)
 
+    async def tool_call(self, name: str, params: dict[str, Any], call_id: str = "") -> None:
+        await self.write(
+            f"Calling Tool: `{name}` with params `{params}`",
+            message_type="thought",
+            event={"type": "tool_call", "call_id": call_id, "name": name, "arguments": params},
+        )
+
+    async def tool_result(self, name: str, result: str, call_id: str = "") -> None:
+        await self.write(
+            f"Result:\n```\n{result}\n```",
+            message_type="thought",
+            event={"type": "tool_result", "call_id": call_id, "name": name, "result": result},
+        )
+
+    async def agent_switch(self, agent: str) -> None:
+        # No text, the tool call already shows the switch
+        await self._publish({"type": "agent_switch", "agent": agent, "text": ""})
+
     async def write(
-        self, text: str, message_type: str | None = None, separate=True, clean=True
+        self, text: str, message_type: str | None = None, separate=True, clean=True, event: dict | None = None
     ) -> None:
         state_changed = False
         if message_type is not None:
-            state_changed = await self._change_state(message_type)
+            state_changed = self._change_state(message_type)
         if separate and not state_changed:
             text = "\n\n" + text
-        if self._queue is not None:
+        if clean:
             # Remove all unwanted thinks, they should be handled explicitly
-            if clean:
-                text = text.replace("<think>", "")
-                text = text.replace("</think>", "")
-            await self._queue.put(text)
-            await self._queue.put("")  # To trigger flushing
+            text = text.replace("<think>", "").replace("</think>", "")
+        if text == "" and not state_changed and event is None:
+            return
+        if event is None:
+            event = self._text_event(text)
         else:
-            print(text, end="")
-        self.output_buffer += text
+            event["text"] = text
+        await self._publish(event)
 
-    async def _change_state(self, state: str) -> bool:
-        state_changed = False
+    async def _publish(self, event: dict[str, Any]) -> None:
+        if self._events is not None:
+            await self._events.put(event)
+        if self._queue is None and not self._echo and self._buffer is None:
+            return  # Nobody needs the markup
+        markup = self._markup.encode(event)
+        if self._queue is not None:
+            if markup != "":
+                await self._queue.put(markup)
+        elif self._echo:
+            print(markup if self._echo_encoder is None else self._echo_encoder.encode(event), end="")
+        if self._buffer is not None:
+            self._buffer.write(markup)
+
+    def _text_event(self, text: str) -> dict[str, Any]:
+        if self._state == "default":
+            return {"type": "token", "text": text}
+        if self._state == "thought":
+            return {"type": "thought", "text": text}
+        return {"type": "detail", "topic": self._topic, "text": text}
+
+    def _change_state(self, state: str) -> bool:
         topic: str = state
         state = state if state in ["default", "thought"] else "detail"
-        if state != self._state:
-            state_changed = True
-            if self._state == "thought":
-                await self.write("\n</think>\n", clean=False, separate=False)
-            elif self._state == "detail":
-                await self.write("\n</details>\n", clean=False, separate=False)
-            if state == "thought":
-                await self.write("\n<think>\n", clean=False, separate=False)
-            elif state == "detail":
-                await self.write(
-                    f"\n<details><summary><b>{topic}:</b></summary>\n\n",
-                    clean=False,
-                    separate=False,
-                )
-        elif self._topic != topic:
-            state_changed = True
-            await self.write("\n</details>\n", clean=False, separate=False)
-            await self.write(
-                f"\n<details><summary><b>{topic}:</b></summary>\n\n",
-                clean=False,
-                separate=False,
-            )
+        state_changed = state != self._state or self._topic != topic
         self._state = state
         self._topic = topic
         return state_changed
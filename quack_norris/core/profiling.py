@@ -0,0 +1,152 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+import asyncio
+import cProfile
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+
+from quack_norris.logging import logger
+
+
+_directory: str | None = None
+_mode = "sampling"
+_every = 1
+_interval = 0.005
+_stall_threshold = 0.25
+_counter = itertools.count()
+_cprofile_lock = threading.Lock()
+
+
+## API
+def setup_profiling(
+    directory: str, mode: str = "sampling", every: int = 1, stall_threshold: float = 0.25
+) -> None:
+    """
+    Enable profiling, writing one profile per profiled request into `directory`.
+
+    `mode` is either `sampling` (collapsed stacks, for flamegraphs) or `cprofile` (pstats).
+    Only every `every`-th request is profiled. Event loop stalls longer than
+    `stall_threshold` seconds are logged with the stack of the blocking code.
+    """
+    global _directory, _mode, _every, _stall_threshold
+    if mode not in ["sampling", "cprofile"]:
+        raise ValueError(f"Unknown profiling mode `{mode}`, use `sampling` or `cprofile`.")
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+    _mode = mode
+    _every = max(every, 1)
+    _stall_threshold = stall_threshold
+    logger.info(f"Profiling every {_every}. request ({_mode}) into `{directory}`")
+
+
+@contextmanager
+def profile(name: str) -> Iterator[None]:
+    """Profile the enclosed code, if profiling is enabled and this request is sampled."""
+    index = next(_counter)
+    if _directory is None or index % _every != 0:
+        yield
+        return
+    path = os.path.join(_directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{index}-{_safe_name(name)}")
+    if _mode == "cprofile":
+        # cProfile can only be active once per process, skip overlapping requests
+        if not _cprofile_lock.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _cprofile_lock.release()
+            profiler.dump_stats(f"{path}.pstats")
+    else:
+        sampler = _StackSampler(threading.get_ident(), _interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.dump(f"{path}.collapsed")
+
+
+def watch_event_loop() -> None:
+    """Log callbacks that block the running event loop longer than the stall threshold."""
+    if _directory is None:
+        return
+    _StallDetector(asyncio.get_running_loop(), threading.get_ident(), _stall_threshold).start()
+
+
+## Internals
+class _StackSampler(threading.Thread):
+    """Samples the stack of a thread in regular intervals and counts the collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _StallDetector(threading.Thread):
+    """Watches a heartbeat scheduled on the event loop and reports when it is late."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, thread_id: int, threshold: float):
+        super().__init__(daemon=True)
+        self._loop = loop
+        self._thread_id = thread_id
+        self._threshold = threshold
+        self._last_beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self._threshold / 4)
+
+    def run(self) -> None:
+        reported_beat = None
+        while not self._loop.is_closed():
+            time.sleep(self._threshold / 4)
+            beat = self._last_beat
+            if time.monotonic() - beat < self._threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # Report each stall only once
+            frame = sys._current_frames().get(self._thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unknown"
+            logger.warning(f"Event loop blocked for more than {self._threshold}s in:\n{stack}")
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
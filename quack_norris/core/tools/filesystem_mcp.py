@@ -15,6 +15,10 @@ from quack_norris.core.tools.ask_user_consent import ask_user_consent
 
 SUPPORTED_TXT_FILES = ['.txt', '.md', '.py', '.json', '.yaml', '.yml', '.csv', '.ini', '.cfg', '.toml', '.js', '.ts', '.html', '.css']
 
+# Clients may cache the results of read-only tools, until a destructive tool is called
+_READ_ONLY = {"readOnlyHint": True, "idempotentHint": True}
+_DESTRUCTIVE = {"readOnlyHint": False, "destructiveHint": True}
+
 
 def build_mcp_server(config_path: str | None = None):
     # By default use the standard quack norris config
@@ -56,7 +60,7 @@ def build_mcp_server(config_path: str | None = None):
 
 
     # Register tool functions directly
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_READ_ONLY)
     def list_workspaces() -> list:
         """Returns a list of workspace names, you always need to do this first.
         All other filesystem functions require you to select a workspace.
@@ -64,7 +68,7 @@ def build_mcp_server(config_path: str | None = None):
         return list(workspaces.keys())
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_READ_ONLY)
     def read_file(workspace: str, file_path: str, start: int = 0, end: int = -1) -> str:
         """Reads the contents of a file (with a character limit)."""
         try:
@@ -77,7 +81,7 @@ def build_mcp_server(config_path: str | None = None):
             return f"Error reading file: {str(e)}"
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_READ_ONLY)
     def list_files(workspace: str, subfolder: str = '.') -> list:
         """Lists files and folders in the specified subfolder of the workspace."""
         try:
@@ -90,7 +94,7 @@ def build_mcp_server(config_path: str | None = None):
             return [f"Error listing files: {str(e)}"]
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_READ_ONLY)
     def list_tree(workspace: str, root: str = '.') -> str:
         """Lists all files and folders like a tree command for the workspace."""
         safe_root = _safe_join(workspace, root)
@@ -112,7 +116,7 @@ def build_mcp_server(config_path: str | None = None):
         return "\n".join(tree_lines)
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_DESTRUCTIVE)
     def write_file(workspace: str, file_path: str, content: str) -> str:
         """Writes content to a file in the workspace."""
         try:
@@ -137,7 +141,7 @@ def build_mcp_server(config_path: str | None = None):
             return f"Error writing file: {str(e)}"
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_DESTRUCTIVE)
     def delete_file(workspace: str, file_path: str) -> str:
         """Deletes a file in the workspace."""
         try:
@@ -195,7 +199,7 @@ def build_mcp_server(config_path: str | None = None):
     #     return [f"Retrieval results for '{query}' in workspace '{workspace}' - functionality to be implemented."]
 
 
-    @mcp_server.tool
+    @mcp_server.tool(annotations=_READ_ONLY)
     def search_text_in_files(workspace: str, pattern: str, folder=".", top_k: int = -1) -> list:
         """Searches for a regex pattern in all text files in the workspace and returns up to top_k matches.
         Use top_k -1 to indicate that you want to find all matches."""
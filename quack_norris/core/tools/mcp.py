@@ -1,15 +1,39 @@
+from collections import OrderedDict
 from typing import Literal, Any
 import asyncio
+import json
+import os
 import subprocess
 import sys
+import threading
+import time
+import weakref
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport, SSETransport, StdioTransport
 
 from quack_norris.logging import logger
+from quack_norris.core.discovery_cache import DiscoveryCache
+from quack_norris.core.file_watcher import watch_directory
 from quack_norris.core.llm.types import Tool
+from quack_norris.core.metrics import TOOL_CACHE_HITS, TOOL_CALLS, TOOL_ERRORS, TOOL_LATENCY
+from quack_norris.core.tracing import span
 
 
-async def initialize_mcp_tools(mcp_configs: dict[str, Any], builtins: bool = True) -> list[Tool]:
+async def initialize_mcp_tools(
+    mcp_configs: dict[str, Any],
+    builtins: bool = True,
+    timeout: float = 30.0,
+    cache: DiscoveryCache | None = None,
+    refresh: bool = False,
+) -> list[Tool]:
+    """
+    Connect to all MCP servers and collect their tools.
+
+    With a `cache`, servers with cached tool schemas are not contacted at all,
+    unless `refresh` is set. When refreshing, the cached schemas are only used
+    as a fallback for servers that cannot be reached.
+    """
+    mcp_configs = dict(mcp_configs)  # Do not add the builtins to the config
     if builtins:
         mcp_configs["filesystem"] = {
             "type": "http",
@@ -22,17 +46,12 @@ async def initialize_mcp_tools(mcp_configs: dict[str, Any], builtins: bool = Tru
     logger.info("Connecting to MCPs")
     tasks = []
     for name, mcp_config in mcp_configs.items():
-        name = (
-            name.replace("-", "_")
-            .replace("/", "_")
-            .replace(".", "_")
-            .replace("(", "_")
-            .replace(")", "_")
-        )
         client = MCPClient(**mcp_config)
-        tasks.append(client.list_tools(prefix=f"{name}."))
+        tasks.append(_discover_tools(client, mcp_config, mcp_tool_prefix(name), timeout, cache, refresh))
     for result in await asyncio.gather(*tasks, return_exceptions=True):
-        if isinstance(result, Exception):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning(f"Failed to gather tools from MCP: no response within {timeout}s")
+        elif isinstance(result, Exception):
             logger.warning(f"Failed to gather tools from MCP for reason: {result}")
         else:
             tools.extend(result)  # type: ignore
@@ -44,6 +63,52 @@ async def initialize_mcp_tools(mcp_configs: dict[str, Any], builtins: bool = Tru
     return tools
 
 
+def mcp_tool_prefix(name: str) -> str:
+    """The prefix of the names of all tools of the MCP server configured as `name`."""
+    for char in "-/.()":
+        name = name.replace(char, "_")
+    return f"{name}."
+
+
+def invalidate_tool_cache() -> None:
+    """Forget all cached tool results, e.g. when files were changed outside of the tools."""
+    for client in list(_clients):
+        client.invalidate_cache()
+
+
+def invalidate_tool_cache_on_changes(directories: list[str]) -> None:
+    """Forget all cached tool results whenever a file in the directories (e.g. the workspaces) changes."""
+    for directory in directories:
+        directory = os.path.abspath(directory)
+        if directory in _watched_directories or not os.path.isdir(directory):
+            continue
+        _watched_directories.add(directory)
+        watch_directory(directory, ("",), lambda paths: invalidate_tool_cache())
+
+
+async def _discover_tools(
+    client: "MCPClient",
+    mcp_config: dict[str, Any],
+    prefix: str,
+    timeout: float,
+    cache: DiscoveryCache | None,
+    refresh: bool,
+) -> list[Tool]:
+    cached = cache.get("mcp", mcp_config) if cache is not None else None
+    if cached is not None and not refresh:
+        return client.make_tools(cached, prefix)
+    try:
+        schemas = await asyncio.wait_for(client.list_tool_schemas(), timeout)
+    except Exception as e:
+        if cached is None:
+            raise
+        logger.warning(f"Failed to refresh tools of MCP `{prefix[:-1]}`, keeping cached tools: {e}")
+        return client.make_tools(cached, prefix)
+    if cache is not None:
+        cache.put("mcp", mcp_config, schemas)
+    return client.make_tools(schemas, prefix)
+
+
 class MCPClient:
     def __init__(
         self,
@@ -52,7 +117,17 @@ class MCPClient:
         command: str = "",
         args: list[str] | None = None,
         headers: dict[str, str] | None = None,
+        startup_timeout: float = 10.0,
+        cache_ttl: float = 30.0,
+        cache_tools: list[str] | None = None,
     ) -> None:
+        """
+        Client for the tools of an MCP server.
+
+        Results of read-only tools (`readOnlyHint` of the server or listed in `cache_tools`)
+        are cached for `cache_ttl` seconds by their arguments. Calling any other tool of
+        the server (e.g. writing a file) invalidates the cache.
+        """
         if type == "http":
             if url == "":
                 raise ValueError("URL must be provided for HTTP mode.")
@@ -73,10 +148,27 @@ class MCPClient:
         self._url = url
         self._command = command
         self._args = args
+        self._startup_timeout = startup_timeout
+        self._cache_ttl = cache_ttl
+        self._cache_tools = set(cache_tools or [])
+        self._results: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+        # Invalidated from the file watcher thread too, reads started before a change must not be cached
+        self._results_lock = threading.Lock()
+        self._generation = 0
+        _clients.add(self)
+
+    def invalidate_cache(self) -> None:
+        with self._results_lock:
+            self._generation += 1
+            self._results.clear()
 
     async def list_tools(self, prefix: str = "") -> list[Tool]:
+        return self.make_tools(await self.list_tool_schemas(), prefix)
+
+    async def list_tool_schemas(self) -> list[dict[str, Any]]:
+        """List the tools of the server as plain (json serializable) dicts."""
         try:
-            return await self._try_listing_tools(prefix)
+            return await self._try_listing_tools()
         except RuntimeError:
             logger.warning(f"Failed to connect to: {self._url}")
         if self._command:
@@ -92,36 +184,98 @@ class MCPClient:
                     shell=sys.platform == "win32",
                     close_fds=True,
                 )
-                await asyncio.sleep(5)
             except Exception as e:
                 logger.warning(f"Failed to start background process: {e}")
+            else:
+                return await self._poll_listing_tools()
 
-        return await self._try_listing_tools(prefix)
-
-    async def _try_listing_tools(self, prefix: str = "") -> list[Tool]:
-        async with self._client:
-            tools = await self._client.list_tools()
-            return [
-                Tool(
-                    name=prefix + tool.name,
-                    description=tool.description or "missing description",
-                    parameters=tool.inputSchema["properties"],
-                    tool_callable=self._make_callable(tool.name),
-                )
-                for tool in tools
-            ]
+        return await self._try_listing_tools()
 
-    def _make_callable(self, tool_name):
-        async def _call_tool(**kwargs: dict) -> str:
+    def make_tools(self, schemas: list[dict[str, Any]], prefix: str = "") -> list[Tool]:
+        return [
+            Tool(
+                name=prefix + schema["name"],
+                description=schema["description"],
+                parameters=schema["parameters"],
+                tool_callable=self._make_callable(
+                    schema["name"], prefix, schema.get("read_only", False) or schema["name"] in self._cache_tools
+                ),
+            )
+            for schema in schemas
+        ]
+
+    async def _poll_listing_tools(self) -> list[dict[str, Any]]:
+        """Retry listing the tools until the freshly started server accepts connections."""
+        deadline = time.monotonic() + self._startup_timeout
+        while True:
+            try:
+                return await self._try_listing_tools()
+            except RuntimeError:
+                if time.monotonic() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    async def _try_listing_tools(self) -> list[dict[str, Any]]:
+        with span("mcp.list_tools", server=self._url or self._command):
             async with self._client:
-                try:
-                    result = await self._client.call_tool(name=tool_name, arguments=kwargs)
-                    out = ""
-                    for content in result.content:
-                        if content.type == "text":
-                            out += content.text
-                    return out
-                except Exception as e:
-                    return f"Error calling tool {tool_name}: {str(e)}"
+                tools = await self._client.list_tools()
+                return [
+                    {
+                        "name": tool.name,
+                        "description": tool.description or "missing description",
+                        "parameters": tool.inputSchema["properties"],
+                        "read_only": _is_read_only(tool.annotations),
+                    }
+                    for tool in tools
+                ]
+
+    def _make_callable(self, tool_name, prefix: str = "", cacheable: bool = False):
+        async def _call_tool(**kwargs: dict) -> str:
+            TOOL_CALLS.inc(tool=prefix + tool_name)
+            key = (tool_name, json.dumps(kwargs, sort_keys=True, default=str))
+            with self._results_lock:
+                generation = self._generation
+                cached = self._results.get(key) if cacheable and self._cache_ttl > 0 else None
+                if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+                    self._results.move_to_end(key)
+                else:
+                    cached = None
+            if cached is not None:
+                TOOL_CACHE_HITS.inc(tool=prefix + tool_name)
+                return cached[1]
+            start = time.perf_counter()
+            with span("mcp.call_tool", tool=prefix + tool_name) as mcp_span:
+                async with self._client:
+                    try:
+                        result = await self._client.call_tool(name=tool_name, arguments=kwargs)
+                        text = "".join(content.text for content in result.content if content.type == "text")
+                    except Exception as e:
+                        TOOL_ERRORS.inc(tool=prefix + tool_name)
+                        mcp_span.error = str(e)
+                        return f"Error calling tool {tool_name}: {str(e)}"
+                    finally:
+                        TOOL_LATENCY.observe(time.perf_counter() - start, tool=prefix + tool_name)
+                        if not cacheable:
+                            self.invalidate_cache()  # The tool may have changed what others read
+            if cacheable and self._cache_ttl > 0:
+                with self._results_lock:
+                    if self._generation == generation:  # Otherwise the result may predate a change
+                        self._results[key] = (time.monotonic(), text)
+                        if len(self._results) > _MAX_CACHED_RESULTS:
+                            self._results.popitem(last=False)
+            return text
 
         return _call_tool
+
+
+## Internals
+def _is_read_only(annotations: Any) -> bool:
+    # The field is `readOnlyHint` in mcp 1.x (fastmcp 2.x) and `read_only_hint` in mcp 2.x
+    if annotations is None:
+        return False
+    return bool(getattr(annotations, "read_only_hint", None) or getattr(annotations, "readOnlyHint", None))
+
+
+_MAX_CACHED_RESULTS = 256
+_clients: "weakref.WeakSet[MCPClient]" = weakref.WeakSet()
+_watched_directories: set[str] = set()
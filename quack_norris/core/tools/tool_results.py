@@ -0,0 +1,86 @@
+from quack_norris.logging import logger
+from quack_norris.config import Config
+from quack_norris.core.blob_store import load_blob, store_blob
+from quack_norris.core.llm.types import Message, Tool
+
+
+READ_RESULT_TOOL = "read_result"
+_TRUNCATED_MARKER = "characters omitted, the full result is available as `"
+
+_max_chars = 16000
+_preview_chars = 4000
+
+
+## API
+def setup_tool_results(config: Config) -> None:
+    """Configure the limits for tool results from the `tool_results` section of the config."""
+    global _max_chars, _preview_chars
+    settings = config.get("tool_results", {})
+    _max_chars = settings.get("max_chars", 16000)
+    _preview_chars = min(settings.get("preview_chars", 4000), _max_chars)
+
+
+def limit_tool_result(result: str) -> str:
+    """
+    Replace a result longer than `max_chars` by a preview of its head and tail.
+
+    The full result is kept in the blob store and the preview names its handle, so
+    the model can page through it with the `read_result` tool.
+    """
+    if len(result) <= _max_chars:
+        return result
+    head = result[:_preview_chars // 2]
+    tail = result[len(result) - _preview_chars // 2:]
+    omitted = len(result) - len(head) - len(tail)
+    handle = store_blob(result, min_size=0)
+    if handle is None:
+        logger.warning("Tool result truncated without handle, the blob store is disabled.")
+        return f"{head}\n\n[... {omitted} characters omitted ...]\n\n{tail}"
+    return (
+        f"{head}\n\n[... {omitted} {_TRUNCATED_MARKER}{handle}` ({len(result)} characters),"
+        f" use `{READ_RESULT_TOOL}` to read it ...]\n\n{tail}"
+    )
+
+
+def is_read_result(tool_name: str) -> bool:
+    """Whether the result comes from `read_result`, its pages must not be truncated again."""
+    return tool_name == READ_RESULT_TOOL
+
+
+def has_truncated_results(messages: list[Message]) -> bool:
+    """Whether a tool result in the messages was truncated, so `read_result` is needed."""
+    return any(
+        message.role == "tool" and message.blob is None and _TRUNCATED_MARKER in message.text()
+        for message in messages
+    )
+
+
+def read_result_tool() -> Tool:
+    return Tool(
+        name=READ_RESULT_TOOL,
+        description="Read a part of a tool result that was too long and therefore truncated.",
+        parameters={
+            "handle": {"type": "string", "title": "The handle of the result, e.g. `sha256:...`"},
+            "offset": {"type": "integer", "title": "First character to read", "default": 0},
+            "length": {"type": "integer", "title": "Number of characters to read", "default": _max_chars},
+        },
+        tool_callable=_read_result,
+    )
+
+
+## Internals
+def _read_result(handle: str, offset: int = 0, length: int = 0) -> str:
+    try:
+        offset, length = int(offset), int(length)
+    except (TypeError, ValueError):
+        return f"Invalid offset `{offset}` or length `{length}`, both must be integers."
+    try:
+        result = load_blob(str(handle).strip("`"))
+    except KeyError:
+        return f"Unknown handle `{handle}`, the result is no longer available."
+    offset = max(offset, 0)
+    length = min(length, _max_chars) if length > 0 else _max_chars
+    end = min(offset + length, len(result))
+    if offset >= len(result):
+        return f"The offset {offset} is beyond the end of the result ({len(result)} characters)."
+    return f"Characters {offset} to {end} of {len(result)}:\n\n{result[offset:end]}"
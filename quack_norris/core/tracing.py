@@ -0,0 +1,156 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+import json
+import os
+import secrets
+import threading
+import time
+
+from quack_norris.logging import logger
+from quack_norris.config import Config
+
+
+_current_span: ContextVar["Span | None"] = ContextVar("quack_norris_span", default=None)
+_open_traces: dict[str, list["Span"]] = {}
+_recent_traces: deque[list["Span"]] = deque(maxlen=100)
+_export_path: str | None = None
+_enabled = True
+_lock = threading.Lock()
+
+
+## API
+def setup_tracing(config: Config) -> None:
+    """Configure tracing from the `tracing` section of the config."""
+    global _recent_traces, _export_path, _enabled
+    settings = config.get("tracing", {})
+    _enabled = settings.get("enabled", True)
+    _recent_traces = deque(maxlen=settings.get("max_traces", 100))
+    _export_path = settings.get("path", None)
+    if _export_path is not None:
+        logger.info(f"Exporting traces to `{_export_path}`")
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator["Span"]:
+    """
+    Record a span for the enclosed code.
+
+    Spans opened inside (also in tasks started inside) become children of this span.
+    A trace is finished and exported when its root span ends.
+    """
+    current = Span(name, _current_span.get(), attributes)
+    if not _enabled:
+        yield current
+        return
+    if current.parent_id is None:
+        with _lock:
+            _open_traces[current.trace_id] = []
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def recent_traces(limit: int = 20) -> list[dict[str, Any]]:
+    """Get the most recent finished traces, newest first."""
+    with _lock:
+        traces = list(_recent_traces)[-limit:]
+    return [
+        {"trace_id": spans[0].trace_id, "spans": [s.to_dict() for s in spans]}
+        for spans in reversed(traces)
+    ]
+
+
+class Span:
+    def __init__(self, name: str, parent: "Span | None", attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.error: str | None = None
+        self.start = time.time_ns()
+        self.stop: int | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        self.stop = time.time_ns()
+        _finish_span(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        stop = self.stop if self.stop is not None else time.time_ns()
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start / 1e9,
+            "duration_ms": (stop - self.start) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> dict[str, Any]:
+        otlp: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.stop),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id is not None:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+## Internals
+def _finish_span(span: Span) -> None:
+    with _lock:
+        spans = _open_traces.get(span.trace_id)
+        if spans is None:
+            return  # The trace already finished, e.g. a task outlived its request
+        spans.append(span)
+        if span.parent_id is not None:
+            return
+        del _open_traces[span.trace_id]
+        spans.sort(key=lambda s: s.start)
+        _recent_traces.append(spans)
+    if _export_path is not None:
+        _export(spans, _export_path)
+
+
+def _export(spans: list[Span], path: str) -> None:
+    """Append the trace as one line in the OTLP json format (like the OTel file exporter)."""
+    line = json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "quack-norris"}}]},
+            "scopeSpans": [{"scope": {"name": "quack_norris"}, "spans": [s.to_otlp() for s in spans]}],
+        }]
+    })
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        logger.warning(f"Failed to export trace: {e}")
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
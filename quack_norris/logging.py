@@ -4,4 +4,9 @@ import sys
 
 def log_only_warn():
     logger.remove()
-    logger.add(sys.stderr, level="WARNING")
+    # Progress messages (`logger.bind(progress=True)`, e.g. of a batch) are still shown
+    logger.add(sys.stderr, level="INFO", filter=_is_warning_or_progress)
+
+
+def _is_warning_or_progress(record) -> bool:
+    return record["level"].no >= logger.level("WARNING").no or record["extra"].get("progress", False)
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from quack_norris.api.single_flight import Broadcaster, SingleFlight
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _subscribe(broadcaster: Broadcaster):
+    """Subscribe and wait until the first chunk arrived, so the subscriber is registered."""
+    subscription = broadcaster.subscribe()
+    first = asyncio.ensure_future(subscription.__anext__())
+    await asyncio.sleep(0)
+    return subscription, first
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def test_late_join_before_replay_limit_receives_the_whole_stream():
+    broadcaster = Broadcaster(replay_limit=4)
+    first, chunk = await _subscribe(broadcaster)
+    for i in range(3):
+        await broadcaster.put(i)
+    assert [await chunk, await first.__anext__(), await first.__anext__()] == [0, 1, 2]
+    assert broadcaster.joinable
+
+    late = broadcaster.subscribe()
+    await broadcaster.close()
+    assert [chunk async for chunk in late] == [0, 1, 2]
+    assert [chunk async for chunk in first] == []
+
+
+async def test_late_join_after_replay_limit_is_not_possible():
+    broadcaster = Broadcaster(replay_limit=4)
+    first, chunk = await _subscribe(broadcaster)
+    for i in range(6):
+        await broadcaster.put(i)
+    received = [await chunk] + [await first.__anext__() for _ in range(5)]
+    assert received == list(range(6))
+    await broadcaster.put(6)
+    assert await first.__anext__() == 6  # Trims the chunks sent before
+    assert not broadcaster.joinable
+
+    late = broadcaster.subscribe()
+    await broadcaster.close()
+    assert 0 not in [chunk async for chunk in late]
+
+
+async def test_single_flight_coalesces_only_while_joinable():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def generate(broadcaster: Broadcaster):
+        for i in range(6):
+            await broadcaster.put(i)
+        await release.wait()
+
+    broadcaster = flight.join("key", generate)
+    broadcaster._replay_limit = 4
+    assert flight.join("key", generate) is broadcaster
+
+    subscription, chunk = await _subscribe(broadcaster)
+    await chunk
+    for _ in range(5):
+        await subscription.__anext__()
+    await _settle()  # Let the subscriber trim
+    assert not broadcaster.joinable
+    other = flight.join("key", generate)
+    assert other is not broadcaster
+
+    release.set()
+    assert [chunk async for chunk in subscription] == []
+    await other.task
+
+
+async def test_put_waits_for_slowest_subscriber_until_it_leaves():
+    broadcaster = Broadcaster(max_backlog=2)
+    fast, fast_chunk = await _subscribe(broadcaster)
+    slow, slow_chunk = await _subscribe(broadcaster)
+
+    async def produce():
+        for i in range(10):
+            await broadcaster.put(i)
+        await broadcaster.close()
+
+    async def consume():
+        return [await fast_chunk] + [chunk async for chunk in fast]
+
+    producer = asyncio.ensure_future(produce())
+    consumer = asyncio.ensure_future(consume())
+    assert await slow_chunk == 0
+    await _settle()
+    assert not producer.done()
+    assert broadcaster.backlog == 2
+
+    await slow.aclose()
+    await asyncio.wait_for(producer, timeout=1)
+    assert await asyncio.wait_for(consumer, timeout=1) == list(range(10))
+
+
+async def test_last_subscriber_leaving_cancels_generation():
+    flight = SingleFlight()
+
+    async def generate(broadcaster: Broadcaster):
+        i = 0
+        while True:
+            await broadcaster.put(i)
+            await asyncio.sleep(0.01)
+            i += 1
+
+    broadcaster = flight.join("key", generate)
+    first, first_chunk = await _subscribe(broadcaster)
+    second, second_chunk = await _subscribe(broadcaster)
+    assert await first_chunk == 0 and await second_chunk == 0
+
+    await first.aclose()
+    await _settle()
+    assert not broadcaster.cancelled
+    assert await second.__anext__() == 1
+
+    await second.aclose()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(broadcaster.task, timeout=1)
+    assert broadcaster.cancelled
+    other = flight.join("key", generate)
+    assert other is not broadcaster
+    other.task.cancel()